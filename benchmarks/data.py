@@ -0,0 +1,103 @@
+"""
+Synthetic, reproducible data for the benchmarks: users, posts and refresh token families.
+
+Every seeded user has the password `PASSWORD`, the same seed always produces the same documents.
+"""
+import hashlib
+import random
+from datetime import datetime, timedelta
+from typing import List
+from uuid import UUID
+
+from miniTicktok_api import counters
+from miniTicktok_api.auth import RefreshToken
+from miniTicktok_api.crpyto import get_password_hash
+from miniTicktok_api.models.post import Post, PostType
+from miniTicktok_api.models.users import User
+
+PASSWORD = 'benchmark-password'
+
+_BATCH_SIZE = 1000
+
+
+class Dataset:
+    def __init__(self, users: List[User], public_posts: int):
+        self.users = users
+        self.public_posts = public_posts
+
+
+def _uuid(rng: random.Random) -> UUID:
+    return UUID(int=rng.getrandbits(128), version=4)
+
+
+async def _insert(collection, documents: List[dict]):
+    for start in range(0, len(documents), _BATCH_SIZE):
+        await collection.insert_many(documents[start:start + _BATCH_SIZE])
+
+
+async def seed(
+        database,
+        users: int,
+        posts: int,
+        refresh_tokens: int,
+        private_ratio: float = 0.2,
+        seed_value: int = 1,
+) -> Dataset:
+    """Fill `database` (a motor or mongomock-motor database) and initialise the post counters."""
+
+    rng = random.Random(seed_value)
+    now = datetime.utcnow()
+    password_hash = get_password_hash(PASSWORD)
+
+    seeded_users = []
+
+    for i in range(users):
+        user = User(
+            id=_uuid(rng),
+            email=f'user{i}@benchmark.example.com',
+            username=f'user{i}',
+            username_discriminator=1000 + i % 9000,
+            password=password_hash,
+            created_at=now - timedelta(days=30),
+        )
+        user.tag = User.create_tag(username=user.username, username_discriminator=user.username_discriminator)
+        seeded_users.append(user)
+
+    await _insert(database.get_collection('users'), [user.dict() for user in seeded_users])
+
+    user_posts = {user.id: 0 for user in seeded_users}
+    public_posts = 0
+    post_documents = []
+
+    for i in range(posts):
+        post = Post(
+            id=_uuid(rng),
+            from_user_id=rng.choice(seeded_users).id,
+            post_type=PostType.PRIVATE if rng.random() < private_ratio else PostType.PUBLIC,
+            title=f'Post number {i}',
+            location=rng.choice(['Lahore', 'Karachi', 'Islamabad', None]),
+            video_uri=f'https://videos.example.com/video-rec-{_uuid(rng)}.mp4',
+            created_at=now - timedelta(seconds=(posts - i) * 60),
+        )
+        post_documents.append(post.dict())
+        user_posts[post.from_user_id] += 1
+        public_posts += post.post_type == PostType.PUBLIC
+
+    await _insert(database.get_collection('posts'), post_documents)
+
+    await _insert(database.get_collection('refresh_tokens'), [
+        RefreshToken(
+            token_family=_uuid(rng),
+            user_id=rng.choice(seeded_users).id,
+            refresh_token_hash=hashlib.sha256(_uuid(rng).bytes).hexdigest(),
+            expires_at=now + timedelta(days=rng.randint(1, 30)),
+        ).dict()
+        for _ in range(refresh_tokens)
+    ])
+
+    await counters.seed(counters.PUBLIC_POSTS, public_posts)
+
+    for user_id, count in user_posts.items():
+        await counters.seed(counters.user_posts(user_id), count)
+
+    return Dataset(users=seeded_users, public_posts=public_posts)
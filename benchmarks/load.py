@@ -0,0 +1,369 @@
+"""
+Load benchmark of the API: seeds synthetic data, drives the real `app` in process and compares the latencies
+and throughput of each scenario against a stored baseline.
+
+    python -m benchmarks.load [--users 200] [--posts 1000] [--refresh-tokens 2000]
+                              [--connections 8] [--requests 100] [--scenario feed_deep ...]
+                              [--db-uri localhost:27017] [--baseline benchmarks/baseline.json]
+                              [--tolerance 0.3] [--slack-ms 5] [--update-baseline]
+
+Without `--db-uri` the data lives in mongomock-motor, otherwise in a throwaway database of that MongoDB
+server, dropped afterwards. Videos are stored with the local storage backend in a temp directory.
+
+Every connection is an in-process ASGI client logged in as its own user. The process exits with 1 when a
+scenario had failed requests, or when its throughput or p50/p95/p99 regressed by more than `--tolerance`.
+
+Baselines only compare on the machine that recorded them, they are not checked in. Record them against a real
+server: mongomock scans whole collections in Python, which dominates the refresh and deep feed scenarios.
+Login latency is mostly bcrypt, queued `connections / password_hasher_workers` deep.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+from uuid import uuid4
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+_PARAMETERS = ('users', 'posts', 'refresh_tokens', 'connections', 'requests', 'db_uri')
+
+
+class Session:
+    """The state of one connection: its client and the user logged in on it."""
+
+    def __init__(self, client, email: str):
+        self.client = client
+        self.email = email
+        self.headers: Dict[str, str] = {}
+        self.refresh_token: Optional[str] = None
+        self.last_job_id: Optional[str] = None
+
+
+class Scenario:
+    def __init__(self, name: str, expected_status: int, request: Callable[[Session, int], Awaitable]):
+        self.name = name
+        self.expected_status = expected_status
+        self.request = request
+
+
+def _percentile(latencies: List[float], percentile: float) -> float:
+    ordered = sorted(latencies)
+    return ordered[max(0, math.ceil(percentile / 100 * len(ordered)) - 1)]
+
+
+def _machine() -> Dict[str, object]:
+    '''what the results depend on besides the parameters, a baseline only compares on the same machine'''
+
+    from miniTicktok_api.config import config
+
+    return {
+        'python': platform.python_version(),
+        'architecture': platform.machine(),
+        'cpus': os.cpu_count(),
+        'password_hasher_workers': config.password_hasher_workers,
+    }
+
+
+def _configure_environment(args, work_dir: str):
+    os.environ.setdefault('APP_APP_URL', 'http://benchmark.example.com')
+    os.environ.setdefault('APP_JWT_SECRET', 'benchmark')
+    os.environ['APP_DB_URI'] = args.db_uri or 'localhost:27017'
+    os.environ['APP_DB_DEFAULT_DATABASE'] = f'benchmark_{uuid4().hex[:8]}'
+    os.environ['APP_DB_APPLY_INDEXES_ON_BOOT'] = 'true' if args.db_uri else 'false'
+    os.environ['APP_STORAGE_BACKEND'] = 'local'
+    os.environ['APP_STORAGE_LOCAL_ROOT'] = os.path.join(work_dir, 'storage')
+    os.environ['APP_VIDEO_CACHE_DIR'] = os.path.join(work_dir, 'video_cache')
+    os.environ['APP_UPLOAD_SPOOL_DIR'] = os.path.join(work_dir, 'spool')
+    # Every connection comes from the same client address.
+    os.environ['APP_RATE_LIMIT_PER_SECOND'] = '0'
+
+
+async def _use_mongomock():
+    '''put an in-memory mongomock-motor database carrying the declared indexes in place of MongoDB'''
+
+    import mongomock.collection
+    from mongomock_motor import AsyncMongoMockClient
+
+    from miniTicktok_api.config import config
+    from miniTicktok_api.indexes import INDEXES
+    from miniTicktok_api.services import services
+
+    # mongomock validates documents with the default BSON codec options, which reject native UUIDs.
+    mongomock.collection.BSON = None
+
+    class MockMongodbDatabase:
+        def __init__(self):
+            self.client = AsyncMongoMockClient()
+            self.database = self.client.get_database(config.db_default_database)
+
+    database = MockMongodbDatabase()
+
+    for collection_name, indexes in INDEXES.items():
+        await database.database.get_collection(collection_name).create_indexes(indexes)
+
+    services.instances['AsyncMongodbDatabase'] = database
+
+
+def _scenarios(dataset) -> List[Scenario]:
+    from benchmarks.data import PASSWORD
+    from miniTicktok_api.routes.utils import ITEMS_PER_PAGE_DEFAULT
+
+    deep_page = max(1, math.ceil(dataset.public_posts / ITEMS_PER_PAGE_DEFAULT) * 9 // 10)
+
+    async def login(session: Session, i: int):
+        return await session.client.post('/oauth/token', data={'username': session.email, 'password': PASSWORD})
+
+    async def refresh(session: Session, i: int):
+        response = await session.client.post('/oauth/token', data={
+            'grant_type': 'refresh_token',
+            'refresh_token': session.refresh_token,
+        })
+
+        if response.status_code == 200:
+            session.refresh_token = response.json()['refresh_token']
+
+        return response
+
+    async def feed_shallow(session: Session, i: int):
+        return await session.client.get('/feed_post', params={'page': 1}, headers=session.headers)
+
+    async def feed_deep(session: Session, i: int):
+        return await session.client.get('/feed_post', params={'page': deep_page}, headers=session.headers)
+
+    async def profile_feed(session: Session, i: int):
+        return await session.client.get('/feed_post/profiles/me', headers=session.headers)
+
+    async def post_create(session: Session, i: int):
+        return await session.client.post('/feed_post', headers=session.headers, json={
+            'title': f'Benchmark post {i}',
+            'video_uri': f'https://videos.example.com/video-rec-{uuid4()}.mp4',
+            'location': 'Lahore',
+        })
+
+    async def video_upload(session: Session, i: int):
+        content = uuid4().bytes * 4096
+        response = await session.client.post('/video_recordings', headers=session.headers,
+                                             files={'file': ('clip.mp4', content, 'video/mp4')})
+
+        if response.status_code == 202:
+            session.last_job_id = response.json()['id']
+
+        return response
+
+    return [
+        Scenario('login', 200, login),
+        Scenario('refresh', 200, refresh),
+        Scenario('feed_shallow', 200, feed_shallow),
+        Scenario('feed_deep', 200, feed_deep),
+        Scenario('profile_feed', 200, profile_feed),
+        Scenario('post_create', 200, post_create),
+        Scenario('video_upload', 202, video_upload),
+    ]
+
+
+async def _run_scenario(scenario: Scenario, sessions: List[Session], requests: int, warmup: int) -> Dict[str, float]:
+    async def drive(count: int, latencies: Optional[List[float]], errors: List[str]):
+        indexes = iter(range(count))
+
+        async def connection(session: Session):
+            for i in indexes:
+                started_at = time.perf_counter()
+                response = await scenario.request(session, i)
+
+                if latencies is not None:
+                    latencies.append(time.perf_counter() - started_at)
+
+                if response.status_code != scenario.expected_status:
+                    errors.append(f'{response.status_code} {response.text[:200]}')
+
+        await asyncio.gather(*(connection(session) for session in sessions))
+
+    await drive(warmup, None, [])
+
+    latencies: List[float] = []
+    errors: List[str] = []
+    started_at = time.perf_counter()
+    await drive(requests, latencies, errors)
+    elapsed = time.perf_counter() - started_at
+
+    if errors:
+        print(f'{scenario.name}: {len(errors)} failed requests, first: {errors[0]}', file=sys.stderr)
+
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'throughput': round(len(latencies) / elapsed, 2),
+        'p50_ms': round(_percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(_percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(_percentile(latencies, 99) * 1000, 2),
+    }
+
+
+async def _wait_for_uploads(sessions: List[Session], timeout: float = 60):
+    '''uploads finish in the background, wait for the last job of every connection'''
+
+    deadline = time.monotonic() + timeout
+
+    for session in sessions:
+        while session.last_job_id and time.monotonic() < deadline:
+            job = (await session.client.get(f'/video_recordings/jobs/{session.last_job_id}',
+                                            headers=session.headers)).json()
+
+            if job.get('status') in ('completed', 'failed'):
+                break
+
+            await asyncio.sleep(0.05)
+
+
+async def run(args) -> Dict[str, Dict[str, float]]:
+    import httpx
+
+    from benchmarks import data
+    from miniTicktok_api.app import app
+    from miniTicktok_api.external.mongodb import AsyncMongodbDatabase
+    from miniTicktok_api.services import services
+
+    if not args.db_uri:
+        await _use_mongomock()
+
+    database = services.get(AsyncMongodbDatabase).database
+    dataset = await data.seed(database, users=args.users, posts=args.posts, refresh_tokens=args.refresh_tokens)
+
+    if args.connections > len(dataset.users):
+        raise SystemExit('--connections must not exceed --users, every connection logs in as its own user.')
+
+    sessions = [
+        Session(httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://benchmark'), user.email)
+        for user in dataset.users[:args.connections]
+    ]
+    results = {}
+
+    try:
+        for session in sessions:
+            token = (await session.client.post('/oauth/token', data={
+                'username': session.email,
+                'password': data.PASSWORD,
+            })).json()
+            session.headers = {'Authorization': f"Bearer {token['access_token']}"}
+            session.refresh_token = token['refresh_token']
+
+        for scenario in _scenarios(dataset):
+            if args.scenario and scenario.name not in args.scenario:
+                continue
+
+            results[scenario.name] = await _run_scenario(scenario, sessions, args.requests, args.warmup)
+
+        await _wait_for_uploads(sessions)
+    finally:
+        for session in sessions:
+            await session.client.aclose()
+
+        if args.db_uri:
+            await services.get(AsyncMongodbDatabase).client.drop_database(database.name)
+
+    return results
+
+
+def _print_results(results: Dict[str, Dict[str, float]]):
+    print(f"{'scenario':<14}{'requests':>9}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+
+    for name, result in results.items():
+        print(f"{name:<14}{result['requests']:>9}{result['errors']:>8}{result['throughput']:>10.1f}"
+              f"{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}{result['p99_ms']:>10.2f}")
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+            tolerance: float, slack_ms: float) -> List[str]:
+    """
+    The regressions of `results` against `baseline`, worse by more than `tolerance` (a fraction).
+
+    Latencies must also be worse by more than `slack_ms`, so that jitter on sub-millisecond requests is ignored.
+    """
+
+    regressions = []
+
+    for name, result in results.items():
+        if result['errors']:
+            regressions.append(f"{name}: {result['errors']} failed requests")
+
+        expected = baseline.get(name)
+
+        if not expected:
+            continue
+
+        if result['throughput'] < expected['throughput'] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {result['throughput']:.1f} req/s, "
+                               f"baseline {expected['throughput']:.1f} req/s")
+
+        for key in ('p50_ms', 'p95_ms', 'p99_ms'):
+            if result[key] > max(expected[key] * (1 + tolerance), expected[key] + slack_ms):
+                regressions.append(f'{name}: {key[:3]} {result[key]:.2f} ms, baseline {expected[key]:.2f} ms')
+
+    return regressions
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.load')
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--posts', type=int, default=1000)
+    parser.add_argument('--refresh-tokens', type=int, default=2000)
+    parser.add_argument('--connections', type=int, default=8, help='Concurrent in-process clients.')
+    parser.add_argument('--requests', type=int, default=100, help='Measured requests per scenario.')
+    parser.add_argument('--warmup', type=int, default=16, help='Unmeasured requests per scenario.')
+    parser.add_argument('--scenario', action='append', help='Run only this scenario, can be repeated.')
+    parser.add_argument('--db-uri', help='Run against this MongoDB server instead of mongomock.')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--tolerance', type=float, default=0.3, help='Allowed slowdown, as a fraction.')
+    parser.add_argument('--slack-ms', type=float, default=5, help='Latency increases always allowed.')
+    parser.add_argument('--update-baseline', action='store_true', help='Store the results as the new baseline.')
+    args = parser.parse_args(argv)
+
+    work_dir = tempfile.mkdtemp(prefix='miniTicktok-benchmark-')
+    _configure_environment(args, work_dir)
+
+    try:
+        results = asyncio.run(run(args))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    _print_results(results)
+
+    parameters = {**{name: getattr(args, name) for name in _PARAMETERS}, 'machine': _machine()}
+    baseline = {'parameters': parameters, 'scenarios': {}}
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+    elif not args.update_baseline:
+        print(f'No baseline at {args.baseline}, store one with --update-baseline.', file=sys.stderr)
+
+    if baseline['parameters'] != parameters:
+        print(f"The baseline was recorded with {baseline['parameters']}, not comparing.", file=sys.stderr)
+        baseline = {'parameters': parameters, 'scenarios': {}}
+
+    if args.update_baseline:
+        baseline['scenarios'].update(results)
+
+        with open(args.baseline, 'w') as baseline_file:
+            json.dump(baseline, baseline_file, indent=2)
+            baseline_file.write('\n')
+
+        return 0
+
+    regressions = compare(results, baseline['scenarios'], args.tolerance, args.slack_ms)
+
+    for regression in regressions:
+        print(f'Regression: {regression}', file=sys.stderr)
+
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
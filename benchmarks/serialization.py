@@ -0,0 +1,89 @@
+"""
+Per-item CPU cost of rendering a feed page: the validating path FastAPI takes for `response_model` versus the
+trusted-construct + orjson path used by the feed endpoints.
+
+    python -m benchmarks.serialization [--items 5] [--rounds 2000]
+"""
+import argparse
+import asyncio
+import os
+import time
+from datetime import datetime
+from uuid import uuid4
+
+from bson import ObjectId
+
+os.environ.setdefault('APP_APP_URL', 'http://localhost.localdomain')
+os.environ.setdefault('APP_DB_URI', 'localhost:27017')
+os.environ.setdefault('APP_JWT_SECRET', 'benchmark')
+os.environ.setdefault('APP_DB_APPLY_INDEXES_ON_BOOT', 'false')
+
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_response_field  # noqa: E402
+
+from miniTicktok_api.responses import FastJSONResponse  # noqa: E402
+from miniTicktok_api.routes.post import PostDetails  # noqa: E402
+from miniTicktok_api.routes.utils import PaginatedList, construct_trusted  # noqa: E402
+
+_loop = asyncio.new_event_loop()
+
+
+def _post_documents(count: int):
+    return [{
+        '_id': ObjectId(),
+        'id': uuid4(),
+        'created_at': datetime.utcnow(),
+        'updated_at': datetime.utcnow(),
+        'deleted_at': None,
+        'title': f'Post number {i}',
+        'location': 'Lahore',
+        'video_uri': f'https://videos.example.com/video-rec-{uuid4()}.mp4',
+        'post_type': 'public',
+        'from_user_id': uuid4(),
+    } for i in range(count)]
+
+
+def _validated(documents, response_field) -> bytes:
+    posts = [PostDetails.parse_obj(document) for document in documents]
+    page = PaginatedList[PostDetails].create_list(items=posts, current_page=1, total_items=100)
+    content = _loop.run_until_complete(serialize_response(field=response_field, response_content=page))
+
+    return JSONResponse(content).body
+
+
+def _trusted(documents, response_field) -> bytes:
+    posts = [construct_trusted(PostDetails, document) for document in documents]
+    page = PaginatedList[PostDetails].create_list(items=posts, current_page=1, total_items=100)
+
+    return FastJSONResponse(page).body
+
+
+def _measure(render, documents, response_field, rounds: int) -> float:
+    started = time.process_time()
+
+    for _ in range(rounds):
+        render(documents, response_field)
+
+    return (time.process_time() - started) / (rounds * len(documents))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--items', type=int, default=5, help='Posts per page.')
+    parser.add_argument('--rounds', type=int, default=2000, help='Pages rendered per variant.')
+    args = parser.parse_args()
+
+    documents = _post_documents(args.items)
+    response_field = create_response_field(name='response', type_=PaginatedList[PostDetails])
+
+    validated = _measure(_validated, documents, response_field, args.rounds)
+    trusted = _measure(_trusted, documents, response_field, args.rounds)
+
+    print(f'validated + json : {validated * 1e6:8.1f} us/item')
+    print(f'trusted + orjson : {trusted * 1e6:8.1f} us/item')
+    print(f'speed-up         : {validated / trusted:8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
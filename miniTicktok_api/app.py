@@ -1,23 +1,104 @@
+from miniTicktok_api import importtime
 from fastapi import FastAPI
+from fastapi.staticfiles import StaticFiles
 from miniTicktok_api.config import config
-from miniTicktok_api.docs.docs import load_api_readme, load_api_tags
+from miniTicktok_api.docs.docs import load_api_readme, load_api_tags, load_openapi_schema
+from miniTicktok_api.lifecycle import lifecycle
+from miniTicktok_api.middleware.admission import AdmissionControlMiddleware
+from miniTicktok_api.middleware.compression import CompressionMiddleware
+from miniTicktok_api.middleware.lifecycle import LifecycleMiddleware
+from miniTicktok_api.middleware.metrics import MetricsMiddleware
+from miniTicktok_api.middleware.profiling import ProfilingMiddleware
+from miniTicktok_api.middleware.uploads import UploadSizeLimitMiddleware
+from miniTicktok_api.metrics import APP_IMPORT_DURATION
 
 
 from miniTicktok_api.routes import auth
 from miniTicktok_api.routes import users
 from miniTicktok_api.routes import post
 from miniTicktok_api.routes import videos
+from miniTicktok_api.routes import metrics
+from miniTicktok_api.routes import admin
+from miniTicktok_api.routes import health
 
 
-app = FastAPI(
-    version=config.app_version,
-    title=config.app_title,
-    description=load_api_readme(),
-    openapi_tags=load_api_tags()
-)
+if config.startup_mode == 'fast':
+    app = FastAPI(
+        version=config.app_version,
+        title=config.app_title,
+    )
+
+    def _prebuilt_openapi() -> dict:
+        if app.openapi_schema is None:
+            app.openapi_schema = load_openapi_schema()
+
+        return app.openapi_schema
+
+    app.openapi = _prebuilt_openapi
+else:
+    app = FastAPI(
+        version=config.app_version,
+        title=config.app_title,
+        description=load_api_readme(),
+        openapi_tags=load_api_tags()
+    )
 
 
 app.include_router(auth.router)
 app.include_router(users.router)
 app.include_router(post.router)
 app.include_router(videos.router)
+app.include_router(metrics.router)
+app.include_router(admin.router)
+app.include_router(health.router)
+
+# The local storage backend links to `{app_url}/media/{key}` unless its files are served elsewhere.
+if config.storage_backend == 'local' and not config.storage_local_base_url:
+    app.mount('/media', StaticFiles(directory=config.storage_local_root, check_dir=False), name='media')
+
+if config.profiling_secret or config.profiling_sample_rate > 0:
+    app.add_middleware(
+        ProfilingMiddleware,
+        secret=config.profiling_secret,
+        sample_rate=config.profiling_sample_rate,
+        directory=config.profiling_dir,
+        max_files=config.profiling_max_files,
+    )
+
+if config.response_compression != 'none':
+    app.add_middleware(
+        CompressionMiddleware,
+        algorithm=config.response_compression,
+        minimum_size=config.response_compression_minimum_size,
+    )
+
+app.add_middleware(
+    AdmissionControlMiddleware,
+    rules=config.admission_rules,
+    rate_limit_per_second=config.rate_limit_per_second,
+    rate_limit_burst=config.rate_limit_burst,
+)
+
+# Outside the admission control, so oversized uploads are turned away without holding an upload slot.
+app.add_middleware(UploadSizeLimitMiddleware, path='/video_recordings', max_bytes=config.upload_max_bytes)
+
+app.add_middleware(LifecycleMiddleware, lifecycle=lifecycle)
+
+app.add_middleware(MetricsMiddleware)
+
+
+@app.on_event('startup')
+async def startup():
+    # Set in every worker. Under the preloading server they were forked after the import, which took this long
+    # in the master process.
+    APP_IMPORT_DURATION.set(import_seconds)
+
+    await lifecycle.startup()
+
+
+@app.on_event('shutdown')
+async def shutdown():
+    await lifecycle.shutdown()
+
+
+import_seconds = importtime.elapsed()
@@ -1,16 +1,19 @@
+import hashlib
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from uuid import uuid4, UUID
 
 from fastapi import HTTPException, Depends
 from fastapi.security import OAuth2PasswordBearer
-from jose import jwt, JWTError
 from pydantic import BaseModel, Field
 from starlette import status
 
+from miniTicktok_api.cache import TTLCache
 from miniTicktok_api.config import config
-from miniTicktok_api.external.mongodb import MongodbDatabase
+from miniTicktok_api.external.mongodb import AsyncMongodbDatabase
+from miniTicktok_api.metrics import stats_collector
 from miniTicktok_api.models.users import User
+from miniTicktok_api.profiles import public_user_cache
 from miniTicktok_api.services import services
 
 
@@ -25,18 +28,38 @@ class AccessToken(BaseModel):
 
 
 class RefreshToken(BaseModel):
-    refresh_token: str
-    access_token: str
-    token_type: str = 'bearer'
+    """
+    The stored state of a refresh token family.
+
+    Only the hash of the family's current refresh token is kept. Rotating the token replaces it in place.
+    """
+
     token_family: UUID = Field()
-    used: bool = False
+    user_id: UUID = Field()
+    refresh_token_hash: str
+    expires_at: datetime
     invalidated: bool = False
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/oauth/token")
 
+current_user_cache = TTLCache(
+    max_size=config.auth_user_cache_size,
+    ttl=config.auth_user_cache_max_staleness_seconds,
+)
+stats_collector.register('current_user_cache', current_user_cache.stats)
+
+
+def invalidate_cached_user(user_id: UUID):
+    """Drop a user from the in-process caches. Call it after updating or soft deleting the user."""
+
+    current_user_cache.pop(user_id)
+    public_user_cache.pop(user_id)
+
 
 async def _get_current_user(token: str = Depends(oauth2_scheme)) -> User:
+    from jose import jwt, JWTError
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -52,13 +75,20 @@ async def _get_current_user(token: str = Depends(oauth2_scheme)) -> User:
     except JWTError:
         raise credentials_exception
 
-    user_data = services.get(MongodbDatabase).database.get_collection(
-        'users').find_one({"id": UUID(token_data.username)})
+    user_id = UUID(token_data.username)
+    user = current_user_cache.get(user_id)
+
+    if user is not None:
+        return user
+
+    user_data = await services.get(AsyncMongodbDatabase).database.get_collection(
+        'users').find_one({"id": user_id})
 
     if user_data is None:
         raise credentials_exception
 
     user = User.parse_obj(user_data)
+    current_user_cache.set(user_id, user)
 
     return user
 
@@ -71,6 +101,8 @@ async def get_current_user(user: User = Depends(_get_current_user)) -> User:
 
 
 def _create_token(data: dict, expires_delta: Optional[timedelta] = None):
+    from jose import jwt
+
     to_encode = data.copy()
 
     if expires_delta:
@@ -84,54 +116,69 @@ def _create_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 
-def generate_access_token(user: User) -> AccessToken:
-    token_family = uuid4()
+def hash_refresh_token(refresh_token: str) -> str:
+    return hashlib.sha256(refresh_token.encode()).hexdigest()
+
+
+def _create_refresh_token(token_family: UUID) -> Tuple[str, datetime]:
+    expires_delta = timedelta(days=config.jwt_refresh_token_expire_days)
 
     refresh_token_string = _create_token(
-        data={"sub": str(token_family)},
-        expires_delta=timedelta(days=config.jwt_refresh_token_expire_days),
+        data={"sub": str(token_family), "jti": uuid4().hex},
+        expires_delta=expires_delta,
     )
 
-    access_token_string = _create_token(
-        data={"sub": str(user.id)},
+    return refresh_token_string, datetime.utcnow() + expires_delta
+
+
+def _create_access_token(user_id: UUID) -> str:
+    return _create_token(
+        data={"sub": str(user_id)},
         expires_delta=timedelta(minutes=config.jwt_access_token_expire_minutes),
     )
 
+
+async def generate_access_token(user: User) -> AccessToken:
+    token_family = uuid4()
+    refresh_token_string, expires_at = _create_refresh_token(token_family)
+
     refresh_token = RefreshToken(
-        refresh_token=refresh_token_string,
-        access_token=access_token_string,
-        token_family=token_family
+        token_family=token_family,
+        user_id=user.id,
+        refresh_token_hash=hash_refresh_token(refresh_token_string),
+        expires_at=expires_at,
     )
-    refresh_tokens_collection = services.get(MongodbDatabase).database.get_collection('refresh_tokens')
-    refresh_tokens_collection.insert_one(refresh_token.dict())
+    refresh_tokens_collection = services.get(AsyncMongodbDatabase).database.get_collection('refresh_tokens')
+    await refresh_tokens_collection.insert_one(refresh_token.dict())
 
-    return AccessToken(access_token=access_token_string, refresh_token=refresh_token_string)
+    return AccessToken(access_token=_create_access_token(user.id), refresh_token=refresh_token_string)
 
 
-def new_access_token_from_refresh_token(old_refresh_token):
-    new_token = _create_token(
-        data={"sub": str(old_refresh_token.token_family)},
-        expires_delta=timedelta(days=config.jwt_refresh_token_expire_days),
-    )
+async def rotate_refresh_token(token_family: UUID, old_refresh_token: str) -> Optional[AccessToken]:
+    """
+    Exchange a refresh token for a new access and refresh token in one atomic update.
 
-    decoded_access_token = jwt.decode(
-        old_refresh_token.access_token,
-        config.jwt_secret,
-        algorithms=[config.jwt_algorithm],
-        options={'verify_exp': False},
-    )
+    Returns `None` when the token is not the current one of a valid family, for instance because it was
+    already used. Two concurrent refreshes with the same token can therefore never both succeed.
+    """
 
-    access_token_string = _create_token(
-        data={"sub": decoded_access_token["sub"]},
-        expires_delta=timedelta(minutes=config.jwt_access_token_expire_minutes),
-    )
+    new_refresh_token, expires_at = _create_refresh_token(token_family)
 
-    new_refresh_token = RefreshToken(
-        refresh_token=new_token,
-        access_token=access_token_string,
-        token_family=old_refresh_token.token_family,
+    refresh_tokens_collection = services.get(AsyncMongodbDatabase).database.get_collection('refresh_tokens')
+    refresh_token_data = await refresh_tokens_collection.find_one_and_update(
+        {
+            "token_family": token_family,
+            "refresh_token_hash": hash_refresh_token(old_refresh_token),
+            "invalidated": False,
+        },
+        {"$set": {"refresh_token_hash": hash_refresh_token(new_refresh_token), "expires_at": expires_at}},
+        projection={"user_id": 1},
     )
-    refresh_tokens_collection = services.get(MongodbDatabase).database.get_collection('refresh_tokens')
-    refresh_tokens_collection.insert_one(new_refresh_token.dict())
 
-    return AccessToken(access_token=access_token_string, refresh_token=new_refresh_token.refresh_token)
+    if not refresh_token_data:
+        return None
+
+    return AccessToken(
+        access_token=_create_access_token(refresh_token_data["user_id"]),
+        refresh_token=new_refresh_token,
+    )
@@ -1,4 +1,17 @@
-from pydantic import BaseSettings
+from typing import List, Optional
+
+from pydantic import BaseModel, BaseSettings, validator
+
+
+class AdmissionRule(BaseModel):
+    """A concurrency limit shared by every request whose path starts with `path`."""
+
+    path: str
+    methods: List[str] = []
+    min_page: Optional[int] = None
+    max_concurrency: int
+    queue_timeout_seconds: float = 0.5
+    retry_after_seconds: int = 1
 
 
 class Config(BaseSettings):
@@ -7,17 +20,118 @@ class Config(BaseSettings):
     app_url: str
     app_release_stage: str = 'production'
 
+    # 'fast' serves the prebuilt docs/openapi.json instead of loading the API docs and building the schema,
+    # regenerate it with `python -m miniTicktok_api.openapi build`.
+    startup_mode: str = 'standard'
+
+    # The production server, see `python -m miniTicktok_api.server`. Defaults to one worker per CPU core.
+    server_bind: str = '0.0.0.0:8000'
+    server_workers: Optional[int] = None
+    server_timeout_seconds: int = 60
+    server_graceful_timeout_seconds: int = 30
+    server_keepalive_seconds: int = 5
+
+    # 'none', 'gzip' or 'brotli' (needs the brotli-asgi package, falls back to gzip for clients without brotli).
+    # Usually left to the reverse proxy. Video content and range requests are never compressed.
+    response_compression: str = 'none'
+    response_compression_minimum_size: int = 1024
+
+    admission_rules: List[AdmissionRule] = [
+        AdmissionRule(path='/oauth/token', methods=['POST'], max_concurrency=8, queue_timeout_seconds=1),
+        AdmissionRule(path='/video_recordings', methods=['POST'], max_concurrency=4, queue_timeout_seconds=2,
+                      retry_after_seconds=5),
+        AdmissionRule(path='/feed_post', methods=['GET'], min_page=20, max_concurrency=4),
+    ]
+    rate_limit_per_second: float = 20
+    rate_limit_burst: int = 40
+    rate_limit_max_clients: int = 100000
+
     db_uri: str
     db_default_database: str = 'Mini_TickTok_v1'
+    db_apply_indexes_on_boot: bool = True
+    # Connections every worker opens at startup, before it reports ready, and keeps open.
+    db_min_pool_size: int = 4
+    db_health_timeout_seconds: float = 2
+
+    # Commands slower than the threshold are recorded in the slow query report, a sample of them is explained.
+    slow_query_threshold_ms: float = 100
+    slow_query_explain_sample_rate: float = 0.1
+    slow_query_explain_interval_seconds: float = 300
+    slow_query_report_max_entries: int = 500
+
+    # Requests are profiled when sampled or when their X-Profile header is signed with the secret,
+    # see `python -m miniTicktok_api.profiling sign`.
+    profiling_secret: Optional[str] = None
+    profiling_sample_rate: float = 0
+    profiling_dir: str = './profiles'
+    profiling_max_files: int = 50
+
+    # How long a stopping worker waits in total for in-flight requests, then for queued uploads, before closing
+    # its clients. Must leave the server time to finish before it kills the worker after its graceful timeout.
+    shutdown_drain_timeout_seconds: float = 20
+
+    # Enables the /admin endpoints, which expect it in the X-Admin-Token header.
+    admin_token: Optional[str] = None
+
+    storage_backend: str = 'mega'
+    storage_pool_size: int = 2
+    storage_session_max_age_seconds: float = 3600
+    storage_local_root: str = './storage'
+    storage_local_base_url: Optional[str] = None
 
-    mega_email = str
-    mega_password = str
+    mega_email: Optional[str] = None
+    mega_password: Optional[str] = None
+
+    b2_key_id: Optional[str] = None
+    b2_application_key: Optional[str] = None
+    b2_bucket_name: Optional[str] = None
+
+    upload_spool_dir: Optional[str] = None
+    upload_chunk_size: int = 1024 * 1024
+    upload_max_bytes: int = 200 * 1024 * 1024
+
+    video_upload_workers: int = 2
+    video_upload_queue_size: int = 32
+    video_upload_max_attempts: int = 4
+    video_upload_retry_backoff_seconds: float = 1
+    video_upload_retry_after_seconds: int = 5
+
+    video_cache_dir: str = './video_cache'
+    video_cache_max_bytes: int = 5 * 1024 * 1024 * 1024
+    video_cache_max_age_seconds: int = 86400
 
     jwt_secret: str
     jwt_algorithm = 'HS256'
     jwt_access_token_expire_minutes = 30
     jwt_refresh_token_expire_days = 30
 
+    password_hasher_workers: int = 2
+    password_hasher_max_queue: int = 32
+    password_hasher_retry_after_seconds: int = 1
+
+    user_tag_allocation_attempts: int = 3
+
+    auth_user_cache_size: int = 10000
+    auth_user_cache_max_staleness_seconds: float = 30
+
+    public_user_cache_size: int = 10000
+    public_user_cache_ttl_seconds: float = 60
+
+    # How paginated lists get their total: 'counter' or 'exact'.
+    post_count_mode: str = 'counter'
+
+    public_feed_cache_pages: int = 5
+    public_feed_cache_ttl_seconds: float = 5
+
+    @validator('shutdown_drain_timeout_seconds')
+    def _drain_within_graceful_timeout(cls, value, values):
+        graceful_timeout = values.get('server_graceful_timeout_seconds')
+
+        if graceful_timeout is not None and value >= graceful_timeout:
+            raise ValueError(f'must be lower than server_graceful_timeout_seconds ({graceful_timeout})')
+
+        return value
+
     class Config:
         env_file = '.env'
         env_file_encoding = 'utf-8'
@@ -0,0 +1,73 @@
+"""
+Maintained document counters, so paginated lists do not need a `count_documents` per request.
+
+A counter that does not exist yet stays missing until it is seeded from a count of its collection on first
+read; writes before that leave it alone. Counters drift only if writes bypass this module, or a write lands
+between that count and the seed. Rebuild them from the source collections with
+`python -m miniTicktok_api.counters rebuild`, once when deploying on an existing database and to correct drift.
+"""
+import sys
+from typing import Optional
+from uuid import UUID
+
+from miniTicktok_api.external.mongodb import AsyncMongodbDatabase
+from miniTicktok_api.services import services
+
+PUBLIC_POSTS = 'public_posts'
+
+
+def user_posts(user_id: UUID) -> str:
+    return f'user_posts:{user_id}'
+
+
+def _counters_collection():
+    return services.get(AsyncMongodbDatabase).database.get_collection('counters')
+
+
+async def increment(key: str, amount: int = 1):
+    """Adjust an existing counter. A missing one is not created, it would start from `amount` instead of the count."""
+
+    await _counters_collection().update_one({'_id': key}, {'$inc': {'count': amount}})
+
+
+async def get_count(key: str) -> Optional[int]:
+    counter = await _counters_collection().find_one({'_id': key})
+
+    return counter['count'] if counter else None
+
+
+async def seed(key: str, count: int):
+    """Initialise a counter that does not exist yet. Existing counters are left untouched."""
+
+    await _counters_collection().update_one({'_id': key}, {'$setOnInsert': {'count': count}}, upsert=True)
+
+
+def rebuild():
+    from miniTicktok_api.config import config
+    from miniTicktok_api.external.mongodb import MongodbDatabase
+    from miniTicktok_api.models.post import PostType
+
+    database = MongodbDatabase(uri=config.db_uri, database=config.db_default_database).database
+    posts_collection = database.get_collection('posts')
+    counters_collection = database.get_collection('counters')
+
+    counts = {PUBLIC_POSTS: posts_collection.count_documents({'post_type': PostType.PUBLIC, 'deleted_at': None})}
+
+    for row in posts_collection.aggregate([
+        {'$match': {'deleted_at': None}},
+        {'$group': {'_id': '$from_user_id', 'count': {'$sum': 1}}},
+    ]):
+        counts[user_posts(row['_id'])] = row['count']
+
+    counters_collection.delete_many({'_id': {'$regex': '^user_posts:'}})
+
+    for key, count in counts.items():
+        counters_collection.update_one({'_id': key}, {'$set': {'count': count}}, upsert=True)
+
+
+if __name__ == '__main__':
+    if sys.argv[1:] != ['rebuild']:
+        print('usage: python -m miniTicktok_api.counters rebuild', file=sys.stderr)
+        sys.exit(2)
+
+    rebuild()
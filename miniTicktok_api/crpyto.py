@@ -1,11 +1,128 @@
-from passlib.context import CryptContext
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Callable, Dict, Optional
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from fastapi import HTTPException
+from starlette import status
+
+from miniTicktok_api.config import config
+from miniTicktok_api.metrics import PASSWORD_HASH_DURATION, stats_collector
+
+
+@lru_cache()
+def _pwd_context():
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return _pwd_context().verify(plain_password, hashed_password)
 
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return _pwd_context().hash(password)
+
+
+class PasswordHasherPool:
+    """
+    Runs bcrypt work on a size-limited thread pool so it never blocks the event loop.
+
+    Calls beyond `max_workers + max_queue` pending jobs are rejected straight away with a 503.
+    The threads do not survive a fork, so a forked child starts over with a new pool.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def reset(self):
+        self.pending = 0
+        self._executor = None
+
+    async def warm_up(self):
+        """Start every worker thread and load bcrypt, so the first request does not pay for it."""
+
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.executor, _pwd_context) for _ in range(self.max_workers)))
+
+    def shutdown(self):
+        """Wait for the running jobs and stop the worker threads."""
+
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='password-hasher')
+
+        return self._executor
+
+    async def run(self, fn: Callable, *args):
+        if self.pending >= self.max_workers + self.max_queue:
+            self.rejected += 1
+
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, please retry shortly.",
+                headers={"Retry-After": str(config.password_hasher_retry_after_seconds)},
+            )
+
+        self.pending += 1
+
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(self.executor, self._timed, fn, *args)
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.pending -= 1
+
+        self.completed += 1
+
+        return result
+
+    @staticmethod
+    def _timed(fn: Callable, *args):
+        with PASSWORD_HASH_DURATION.labels(fn.__name__).time():
+            return fn(*args)
+
+    def stats(self) -> Dict[str, float]:
+        busy = min(self.pending, self.max_workers)
+
+        return {
+            'workers': self.max_workers,
+            'busy': busy,
+            'queued': self.pending - busy,
+            'max_queue': self.max_queue,
+            'utilisation': busy / self.max_workers,
+            'completed': self.completed,
+            'failed': self.failed,
+            'rejected': self.rejected,
+        }
+
+
+password_hasher = PasswordHasherPool(
+    max_workers=config.password_hasher_workers,
+    max_queue=config.password_hasher_max_queue,
+)
+stats_collector.register('password_hasher', password_hasher.stats)
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=password_hasher.reset)
+
+
+async def verify_password_async(plain_password, hashed_password) -> bool:
+    return await password_hasher.run(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password) -> str:
+    return await password_hasher.run(get_password_hash, password)
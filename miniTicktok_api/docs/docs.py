@@ -1,4 +1,5 @@
 import glob
+import json
 import ntpath
 from pathlib import Path
 from typing import List
@@ -12,6 +13,12 @@ def load_api_readme() -> str:
     return description
 
 
+def load_openapi_schema() -> dict:
+    path = Path(__file__).parent
+    with open(f"{path}/openapi.json", 'r') as file:
+        return json.load(file)
+
+
 def load_api_tags() -> List:
     tags = []
 
@@ -1,4 +1,7 @@
+from typing import List, Optional
+
 import pymongo
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 from pymongo import MongoClient
 from pymongo.database import Database
 
@@ -7,6 +10,19 @@ class MongodbDatabase:
     client: MongoClient
     database: Database
 
-    def __init__(self, uri, database: str):
-        self.client = pymongo.MongoClient(f"mongodb://{uri}")
+    def __init__(self, uri, database: str, event_listeners: Optional[List] = None):
+        self.client = pymongo.MongoClient(f"mongodb://{uri}", event_listeners=event_listeners)
+        self.database = self.client.get_database(database)
+
+
+class AsyncMongodbDatabase:
+    """Non-blocking variant of `MongodbDatabase` for use inside `async` route handlers."""
+
+    client: AsyncIOMotorClient
+    database: AsyncIOMotorDatabase
+
+    def __init__(self, uri, database: str, event_listeners: Optional[List] = None, min_pool_size: int = 0):
+        self.client = AsyncIOMotorClient(f"mongodb://{uri}", event_listeners=event_listeners,
+                                         minPoolSize=min_pool_size)
+        self.min_pool_size = min_pool_size
         self.database = self.client.get_database(database)
@@ -0,0 +1,150 @@
+import os
+import queue
+import shutil
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Tuple
+
+
+class SessionPool:
+    """
+    A pool of long-lived, authenticated client sessions.
+
+    Sessions are created on demand up to `size`, re-created once they are older than `max_age`
+    seconds, and dropped when an operation fails on them, so the next checkout re-authenticates.
+    """
+
+    def __init__(self, login: Callable[[], Any], size: int, max_age: float):
+        self._login = login
+        self._max_age = max_age
+        self._idle: 'queue.LifoQueue[Tuple[float, Any]]' = queue.LifoQueue()
+        self._slots = queue.Queue(maxsize=size)
+
+        for _ in range(size):
+            self._slots.put(None)
+
+    @contextmanager
+    def session(self) -> Iterator[Any]:
+        self._slots.get()
+
+        try:
+            try:
+                created_at, client = self._idle.get_nowait()
+            except queue.Empty:
+                created_at, client = None, None
+
+            if client is None or time.monotonic() - created_at > self._max_age:
+                created_at, client = time.monotonic(), self._login()
+
+            yield client
+
+            self._idle.put((created_at, client))
+        finally:
+            self._slots.put(None)
+
+
+class StorageBackend(ABC):
+    """Stores uploaded video files and returns a public link to them."""
+
+    @abstractmethod
+    def upload(self, local_path: str, key: str) -> str:
+        pass
+
+    @abstractmethod
+    def download(self, key: str, dest_path: str):
+        pass
+
+    @abstractmethod
+    def delete(self, key: str):
+        pass
+
+
+class LocalStorageBackend(StorageBackend):
+    """
+    Keeps files in a directory on local disk. Meant for tests and on-prem deployments.
+
+    The app serves the directory under `/media`, unless `storage_local_base_url` points elsewhere.
+    """
+
+    def __init__(self, root: str, base_url: str):
+        self.root = root
+        self.base_url = base_url.rstrip('/')
+        os.makedirs(self.root, exist_ok=True)
+
+    def upload(self, local_path: str, key: str) -> str:
+        shutil.copyfile(local_path, os.path.join(self.root, key))
+
+        return f'{self.base_url}/{key}'
+
+    def download(self, key: str, dest_path: str):
+        shutil.copyfile(os.path.join(self.root, key), dest_path)
+
+    def delete(self, key: str):
+        path = os.path.join(self.root, key)
+
+        if os.path.exists(path):
+            os.remove(path)
+
+
+class MegaStorageBackend(StorageBackend):
+    def __init__(self, email: str, password: str, pool_size: int, session_max_age: float):
+        self.email = email
+        self.password = password
+        self.sessions = SessionPool(self._login, pool_size, session_max_age)
+
+    def _login(self):
+        from mega import Mega
+        return Mega().login(self.email, self.password)
+
+    def upload(self, local_path: str, key: str) -> str:
+        with self.sessions.session() as mega:
+            uploaded = mega.upload(local_path, dest_filename=key)
+
+            return mega.get_upload_link(uploaded)
+
+    def download(self, key: str, dest_path: str):
+        with self.sessions.session() as mega:
+            mega.download(
+                mega.find(key),
+                dest_path=os.path.dirname(dest_path),
+                dest_filename=os.path.basename(dest_path),
+            )
+
+    def delete(self, key: str):
+        with self.sessions.session() as mega:
+            file = mega.find(key)
+
+            if file:
+                mega.destroy(file[0])
+
+
+class B2StorageBackend(StorageBackend):
+    def __init__(self, key_id: str, application_key: str, bucket_name: str, pool_size: int, session_max_age: float):
+        self.key_id = key_id
+        self.application_key = application_key
+        self.bucket_name = bucket_name
+        self.sessions = SessionPool(self._login, pool_size, session_max_age)
+
+    def _login(self):
+        from b2sdk.v2 import B2Api, InMemoryAccountInfo
+
+        b2_api = B2Api(InMemoryAccountInfo())
+        b2_api.authorize_account('production', self.key_id, self.application_key)
+
+        return b2_api, b2_api.get_bucket_by_name(self.bucket_name)
+
+    def upload(self, local_path: str, key: str) -> str:
+        with self.sessions.session() as (b2_api, bucket):
+            file_version = bucket.upload_local_file(local_file=local_path, file_name=key)
+
+            return b2_api.get_download_url_for_fileid(file_version.id_)
+
+    def download(self, key: str, dest_path: str):
+        with self.sessions.session() as (b2_api, bucket):
+            bucket.download_file_by_name(key).save_to(dest_path)
+
+    def delete(self, key: str):
+        with self.sessions.session() as (b2_api, bucket):
+            file_version = bucket.get_file_info_by_name(key)
+            b2_api.delete_file_version(file_version.id_, key)
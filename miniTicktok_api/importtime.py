@@ -0,0 +1,91 @@
+"""
+Cold start report: how long a fresh interpreter takes to import `miniTicktok_api.app`, and where that time goes.
+
+    python -m miniTicktok_api.importtime [--runs 3] [--top 15] [--json] [--max-seconds 2]
+
+Running workers export their own import time as the `app_import_duration_seconds` metric. `app.py` imports
+this module first, which starts the clock, so keep it free of anything but the standard library.
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+_started_at = time.perf_counter()
+
+_IMPORT_APP = 'import miniTicktok_api.app'
+
+_TIMED_IMPORT = (
+    'import time\n'
+    'started_at = time.perf_counter()\n'
+    f'{_IMPORT_APP}\n'
+    'print(time.perf_counter() - started_at)\n'
+)
+
+
+def elapsed() -> float:
+    """Seconds since this module got imported."""
+
+    return time.perf_counter() - _started_at
+
+
+def measure_import_seconds(runs: int) -> float:
+    '''the fastest of `runs` imports of the app, each in a fresh interpreter'''
+
+    timings = []
+
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', _TIMED_IMPORT], check=True, capture_output=True, text=True)
+        timings.append(float(output.stdout.strip().splitlines()[-1]))
+
+    return min(timings)
+
+
+def import_time_by_package() -> Dict[str, float]:
+    '''seconds spent importing each top-level package, as reported by `python -X importtime`'''
+
+    output = subprocess.run([sys.executable, '-X', 'importtime', '-c', _IMPORT_APP],
+                            check=True, capture_output=True, text=True)
+    packages: Dict[str, float] = defaultdict(float)
+
+    for line in output.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+
+        self_us, _, name = line[len('import time:'):].split('|')
+        packages[name.strip().split('.')[0]] += int(self_us) / 1e6
+
+    return dict(sorted(packages.items(), key=lambda package: package[1], reverse=True))
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m miniTicktok_api.importtime')
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON.')
+    parser.add_argument('--max-seconds', type=float, help='Exit with 1 when importing takes longer.')
+    args = parser.parse_args(argv)
+
+    import_seconds = measure_import_seconds(args.runs)
+    packages = dict(list(import_time_by_package().items())[:args.top])
+
+    if args.json:
+        print(json.dumps({'import_seconds': import_seconds, 'packages': packages}, indent=2))
+    else:
+        print(f'import miniTicktok_api.app: {import_seconds * 1000:.0f} ms (fastest of {args.runs})\n')
+
+        for package, seconds in packages.items():
+            print(f'{package:<32}{seconds * 1000:>8.1f} ms')
+
+    if args.max_seconds is not None and import_seconds > args.max_seconds:
+        print(f'Import time exceeds {args.max_seconds} s.', file=sys.stderr)
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
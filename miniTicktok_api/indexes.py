@@ -0,0 +1,121 @@
+"""
+Declared MongoDB indexes.
+
+Apply them with `python -m miniTicktok_api.indexes apply` or let
+`MongodbDatabaseServiceProvider.startup()` do it when a worker starts,
+and verify a deployed database with `python -m miniTicktok_api.indexes check`.
+"""
+import argparse
+import logging
+import sys
+from typing import Dict, List
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.database import Database
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger('app_logger')
+
+ACTIVE_ONLY = {'deleted_at': None}
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    'users': [
+        IndexModel([('id', ASCENDING)], name='users_id', unique=True),
+        IndexModel([('email', ASCENDING)], name='users_email_active', unique=True,
+                   partialFilterExpression=ACTIVE_ONLY),
+        IndexModel([('tag', ASCENDING)], name='users_tag_active', unique=True,
+                   partialFilterExpression=ACTIVE_ONLY),
+    ],
+    'posts': [
+        IndexModel([('id', ASCENDING)], name='posts_id', unique=True),
+        IndexModel([('post_type', ASCENDING), ('created_at', DESCENDING), ('id', DESCENDING)],
+                   name='posts_feed'),
+        IndexModel([('from_user_id', ASCENDING), ('created_at', DESCENDING), ('id', DESCENDING)],
+                   name='posts_by_user'),
+    ],
+    'video_recordings': [
+        IndexModel([('id', ASCENDING)], name='video_recordings_id', unique=True),
+        IndexModel([('content_sha256', ASCENDING)], name='video_recordings_content_sha256'),
+    ],
+    'video_objects': [
+        IndexModel([('content_sha256', ASCENDING)], name='video_objects_content_sha256', unique=True),
+    ],
+    'video_upload_jobs': [
+        IndexModel([('id', ASCENDING)], name='video_upload_jobs_id', unique=True),
+    ],
+    'refresh_tokens': [
+        IndexModel([('token_family', ASCENDING)], name='refresh_tokens_token_family', unique=True),
+        IndexModel([('expires_at', ASCENDING)], name='refresh_tokens_expires_at', expireAfterSeconds=0),
+    ],
+}
+
+_COMPARED_OPTIONS = ('unique', 'partialFilterExpression', 'expireAfterSeconds')
+
+
+def apply_indexes(database: Database):
+    """
+    Create every declared index. Indexes that already exist with the same definition are left as they are.
+
+    Indexes are created one by one, so one that fails (say a unique index over duplicate legacy rows, see
+    `miniTicktok_api.migrations`) does not keep the others of its collection from being created.
+    """
+
+    for collection_name, indexes in INDEXES.items():
+        for index in indexes:
+            try:
+                database.get_collection(collection_name).create_indexes([index])
+            except OperationFailure as e:
+                logger.error(f'Failed to apply index "{index.document["name"]}" on "{collection_name}": {e}')
+
+
+def _key_pattern(keys) -> list:
+    return [(field, int(direction) if isinstance(direction, (int, float)) else direction) for field, direction in keys]
+
+
+def _matches(declared: dict, deployed: dict) -> bool:
+    if _key_pattern(declared['key'].items()) != _key_pattern(deployed['key']):
+        return False
+
+    return all(declared.get(option) == deployed.get(option) for option in _COMPARED_OPTIONS)
+
+
+def missing_indexes(database: Database) -> List[str]:
+    """Names of declared indexes that are missing from, or defined differently in, the database."""
+
+    missing = []
+
+    for collection_name, indexes in INDEXES.items():
+        deployed = database.get_collection(collection_name).index_information()
+
+        for index in indexes:
+            declared = index.document
+
+            if not any(_matches(declared, deployed_index) for deployed_index in deployed.values()):
+                missing.append(f"{collection_name}.{declared['name']}")
+
+    return missing
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m miniTicktok_api.indexes')
+    parser.add_argument('command', choices=['check', 'apply'])
+    args = parser.parse_args(argv)
+
+    from miniTicktok_api.config import config
+    from miniTicktok_api.external.mongodb import MongodbDatabase
+
+    database = MongodbDatabase(uri=config.db_uri, database=config.db_default_database).database
+
+    if args.command == 'apply':
+        apply_indexes(database)
+
+    missing = missing_indexes(database)
+
+    for name in missing:
+        print(f'Missing index: {name}', file=sys.stderr)
+
+    return 1 if missing else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
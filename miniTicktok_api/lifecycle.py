@@ -0,0 +1,66 @@
+"""
+Startup and shutdown of a worker, run by the FastAPI lifespan events.
+
+Startup prepares everything the first request would otherwise pay for: the database connection pool, the
+storage backend, the upload workers, the password hasher threads and the lazily imported JWT library. The
+worker reports ready on `/health/ready` only once that is done.
+
+On shutdown the worker reports not ready and answers new requests with a 503. It waits for the in-flight
+requests and then for the queued uploads, before closing the clients. Both waits share one deadline,
+`shutdown_drain_timeout_seconds` from the start of the shutdown.
+"""
+import asyncio
+import time
+from importlib import import_module
+from typing import Dict, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from miniTicktok_api.config import config
+from miniTicktok_api.crpyto import password_hasher
+from miniTicktok_api.services import services
+
+
+class Lifecycle:
+    logger = services.logger
+
+    def __init__(self):
+        self.started = False
+        self.draining = False
+        self.in_flight = 0
+
+    async def startup(self):
+        started_at = time.perf_counter()
+
+        await services.startup()
+        await password_hasher.warm_up()
+        import_module('jose.jwt')
+
+        self.started = True
+        self.logger.info(f'Worker ready after {time.perf_counter() - started_at:.2f}s.')
+
+    async def shutdown(self):
+        self.draining = True
+        deadline = time.monotonic() + config.shutdown_drain_timeout_seconds
+
+        await self._drain(deadline)
+        await services.shutdown(deadline)
+        await run_in_threadpool(password_hasher.shutdown)
+
+    async def _drain(self, deadline: float):
+        while self.in_flight and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+
+        if self.in_flight:
+            self.logger.warning(f'Shutting down with {self.in_flight} requests still in flight.')
+
+    async def readiness(self) -> Tuple[bool, Dict[str, bool]]:
+        if not self.started or self.draining:
+            return False, {'started': self.started, 'draining': self.draining}
+
+        checks = await services.health()
+
+        return all(checks.values()), checks
+
+
+lifecycle = Lifecycle()
@@ -0,0 +1,190 @@
+"""
+Prometheus metrics for the API, the MongoDB client and the background workers.
+
+Everything is registered in the default registry and exposed on `GET /metrics`.
+"""
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, Optional
+
+from prometheus_client import Counter, Gauge, Histogram
+from prometheus_client.core import GaugeMetricFamily, REGISTRY
+from pymongo import monitoring
+
+# Path template of the route handling the current request, set by `MetricsMiddleware`.
+current_route = ContextVar('current_route', default='')
+
+HTTP_REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds',
+    'Time spent handling HTTP requests.',
+    ['method', 'route'],
+)
+
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    'http_requests_in_flight',
+    'HTTP requests currently being handled.',
+    ['method', 'route'],
+    multiprocess_mode='livesum',
+)
+
+HTTP_RESPONSES = Counter(
+    'http_responses_total',
+    'HTTP responses sent, by status code.',
+    ['method', 'route', 'status'],
+)
+
+MONGODB_COMMAND_DURATION = Histogram(
+    'mongodb_command_duration_seconds',
+    'Duration of MongoDB commands.',
+    ['collection', 'command'],
+    buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5),
+)
+
+MONGODB_COMMAND_FAILURES = Counter(
+    'mongodb_command_failures_total',
+    'MongoDB commands that failed.',
+    ['collection', 'command'],
+)
+
+MONGODB_POOL_CHECKOUT_WAIT = Histogram(
+    'mongodb_pool_checkout_wait_seconds',
+    'Time spent waiting to check a connection out of the MongoDB connection pool.',
+    buckets=(.0001, .0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1),
+)
+
+PASSWORD_HASH_DURATION = Histogram(
+    'password_hash_duration_seconds',
+    'Time spent in bcrypt, by operation.',
+    ['operation'],
+)
+
+VIDEO_UPLOAD_DURATION = Histogram(
+    'video_upload_duration_seconds',
+    'Time spent uploading videos to the storage backend, by outcome.',
+    ['outcome'],
+    buckets=(.1, .25, .5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+)
+
+APP_IMPORT_DURATION = Gauge(
+    'app_import_duration_seconds',
+    'Time spent importing the application module, with its dependencies, when the process started.',
+    multiprocess_mode='max',
+)
+
+FEED_STAGE_DURATION = Histogram(
+    'feed_stage_duration_seconds',
+    'Time spent in each stage of rendering a feed page.',
+    ['feed', 'stage'],
+    buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1),
+)
+
+
+class CommandMetricsListener(monitoring.CommandListener):
+    """Records the duration of every MongoDB command, labelled by collection and command name."""
+
+    def __init__(self):
+        self._collections: Dict[int, str] = {}
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        collection = event.command.get(event.command_name)
+
+        if event.command_name == 'getMore':
+            collection = event.command.get('collection')
+
+        self._collections[event.request_id] = collection if isinstance(collection, str) else ''
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        collection = self._collections.pop(event.request_id, '')
+        MONGODB_COMMAND_DURATION.labels(collection, event.command_name).observe(event.duration_micros / 1e6)
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        collection = self._collections.pop(event.request_id, '')
+        MONGODB_COMMAND_DURATION.labels(collection, event.command_name).observe(event.duration_micros / 1e6)
+        MONGODB_COMMAND_FAILURES.labels(collection, event.command_name).inc()
+
+
+class PoolMetricsListener(monitoring.ConnectionPoolListener):
+    """Records how long operations wait for a connection from the pool."""
+
+    def __init__(self):
+        self._checkout_started = threading.local()
+
+    def connection_check_out_started(self, event):
+        self._checkout_started.at = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        self._observe()
+
+    def connection_check_out_failed(self, event):
+        self._observe()
+
+    def _observe(self):
+        started_at = getattr(self._checkout_started, 'at', None)
+
+        if started_at is not None:
+            MONGODB_POOL_CHECKOUT_WAIT.observe(time.perf_counter() - started_at)
+            self._checkout_started.at = None
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pass
+
+    def connection_checked_in(self, event):
+        pass
+
+
+def mongodb_event_listeners() -> list:
+    return [CommandMetricsListener(), PoolMetricsListener()]
+
+
+class StatsCollector:
+    """
+    Publishes the `stats()` of in-process pools and caches as `app_<component>_<stat>` gauges.
+
+    They describe the process that serves the scrape. With several workers, use `with_labels(pid=...)` so the
+    series of each worker stay apart.
+    """
+
+    def __init__(self, labels: Optional[Dict[str, str]] = None,
+                 sources: Optional[Dict[str, Callable[[], Dict[str, float]]]] = None):
+        self.labels = labels or {}
+        self._sources: Dict[str, Callable[[], Dict[str, float]]] = {} if sources is None else sources
+
+    def register(self, component: str, stats: Callable[[], Dict[str, float]]):
+        self._sources[component] = stats
+
+    def with_labels(self, **labels: str) -> 'StatsCollector':
+        '''a collector of the same sources, adding `labels` to every gauge'''
+
+        return StatsCollector(labels={**self.labels, **labels}, sources=self._sources)
+
+    def collect(self) -> Iterable[GaugeMetricFamily]:
+        for component, stats in list(self._sources.items()):
+            for key, value in stats().items():
+                gauge = GaugeMetricFamily(
+                    f'app_{component}_{key}', f'The "{key}" statistic of {component}.', labels=list(self.labels))
+                gauge.add_metric(list(self.labels.values()), value)
+
+                yield gauge
+
+
+stats_collector = StatsCollector()
+REGISTRY.register(stats_collector)
@@ -0,0 +1,141 @@
+import asyncio
+import math
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from miniTicktok_api.cache import TTLCache
+from miniTicktok_api.config import AdmissionRule, config
+
+# A 429 on a load balancer probe or a metric scrape would take the instance out of rotation or leave a gap in
+# its metrics.
+EXEMPT_PATHS = ('/health', '/metrics')
+
+
+class AdmissionControlMiddleware:
+    """
+    Sheds load before it reaches the route handlers.
+
+    Requests matching an `AdmissionRule` share that rule's concurrency limit and wait at most its queue
+    timeout for a slot before being rejected with a 503. Every request also spends a token from a per-user
+    (or, without a valid access token, per-client-IP) token bucket and is rejected with a 429 once it is empty.
+    Health checks and metric scrapes (`EXEMPT_PATHS`) are never limited.
+    """
+
+    def __init__(
+            self,
+            app: ASGIApp,
+            rules: List[AdmissionRule],
+            rate_limit_per_second: float,
+            rate_limit_burst: int,
+    ):
+        self.app = app
+        self.rules = rules
+        self.rate_limit_per_second = rate_limit_per_second
+        self.rate_limit_burst = rate_limit_burst
+        self._semaphores: Dict[int, asyncio.Semaphore] = {}
+        self._buckets = TTLCache(
+            max_size=config.rate_limit_max_clients,
+            ttl=rate_limit_burst / rate_limit_per_second if rate_limit_per_second > 0 else 0,
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http' or scope['path'].startswith(EXEMPT_PATHS):
+            await self.app(scope, receive, send)
+            return
+
+        if self.rate_limit_per_second > 0:
+            retry_after = self._take_token(self._client_key(scope))
+
+            if retry_after:
+                await self._reject(scope, receive, send, 429, 'Too many requests.', retry_after)
+                return
+
+        rule_index, rule = self._match_rule(scope)
+
+        if rule is None:
+            await self.app(scope, receive, send)
+            return
+
+        semaphore = self._semaphores.get(rule_index)
+
+        if semaphore is None:
+            semaphore = self._semaphores[rule_index] = asyncio.Semaphore(rule.max_concurrency)
+
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout=rule.queue_timeout_seconds)
+        except asyncio.TimeoutError:
+            await self._reject(scope, receive, send, 503, 'Server is busy, please retry shortly.',
+                               rule.retry_after_seconds)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            semaphore.release()
+
+    def _match_rule(self, scope: Scope) -> Tuple[int, Optional[AdmissionRule]]:
+        for index, rule in enumerate(self.rules):
+            if not scope['path'].startswith(rule.path):
+                continue
+
+            if rule.methods and scope['method'] not in rule.methods:
+                continue
+
+            if rule.min_page is not None and _page(scope) < rule.min_page:
+                continue
+
+            return index, rule
+
+        return -1, None
+
+    @staticmethod
+    def _client_key(scope: Scope) -> str:
+        for name, value in scope['headers']:
+            if name == b'authorization' and value[:7].lower() == b'bearer ':
+                from jose import jwt, JWTError
+
+                try:
+                    payload = jwt.decode(value[7:].decode('latin-1'), config.jwt_secret,
+                                         algorithms=[config.jwt_algorithm])
+                except JWTError:
+                    break
+
+                if payload.get('sub'):
+                    return f"user:{payload['sub']}"
+
+        client = scope.get('client')
+
+        return f'ip:{client[0]}' if client else 'ip:unknown'
+
+    def _take_token(self, key: str) -> int:
+        """Spend a token from the client's bucket. Returns 0 when allowed, else the seconds until one is free."""
+
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.get(key, (self.rate_limit_burst, now))
+        tokens = min(self.rate_limit_burst, tokens + (now - updated_at) * self.rate_limit_per_second)
+
+        if tokens < 1:
+            self._buckets.set(key, (tokens, now))
+            return max(1, math.ceil((1 - tokens) / self.rate_limit_per_second))
+
+        self._buckets.set(key, (tokens - 1, now))
+
+        return 0
+
+    @staticmethod
+    async def _reject(scope: Scope, receive: Receive, send: Send, status_code: int, detail: str, retry_after: int):
+        response = JSONResponse({'detail': detail}, status_code=status_code, headers={'Retry-After': str(retry_after)})
+        await response(scope, receive, send)
+
+
+def _page(scope: Scope) -> int:
+    pages = parse_qs(scope.get('query_string', b'').decode('latin-1')).get('page')
+
+    try:
+        return int(pages[0]) if pages else 1
+    except ValueError:
+        return 1
@@ -0,0 +1,37 @@
+import re
+
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+# Video content is already compressed, and served with byte ranges that compression would break.
+VIDEO_PATHS = re.compile(r'^/(media/|video_recordings/[^/]+/content$)')
+
+
+class CompressionMiddleware:
+    """
+    Compresses responses with gzip or, with `algorithm='brotli'`, with brotli-asgi (falling back to gzip for
+    clients without brotli support).
+
+    Requests for video content and requests with a `Range` header are passed through untouched: compressing
+    them would only waste CPU, and would break partial responses and their `Content-Range`/`Content-Length`.
+    """
+
+    def __init__(self, app: ASGIApp, algorithm: str, minimum_size: int):
+        self.app = app
+
+        if algorithm == 'brotli':
+            from brotli_asgi import BrotliMiddleware
+            self.compressed_app = BrotliMiddleware(app, minimum_size=minimum_size)
+        else:
+            self.compressed_app = GZipMiddleware(app, minimum_size=minimum_size)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http' or VIDEO_PATHS.match(scope['path']) or _has_range(scope):
+            await self.app(scope, receive, send)
+            return
+
+        await self.compressed_app(scope, receive, send)
+
+
+def _has_range(scope: Scope) -> bool:
+    return any(name == b'range' for name, _ in scope['headers'])
@@ -0,0 +1,36 @@
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from miniTicktok_api.lifecycle import Lifecycle
+
+
+class LifecycleMiddleware:
+    """
+    Counts the in-flight requests for the shutdown drain, and rejects new requests with a 503 once the worker
+    is draining. Health checks keep being answered.
+    """
+
+    def __init__(self, app: ASGIApp, lifecycle: Lifecycle):
+        self.app = app
+        self.lifecycle = lifecycle
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http' or scope['path'].startswith('/health'):
+            await self.app(scope, receive, send)
+            return
+
+        if self.lifecycle.draining:
+            response = JSONResponse(
+                {'detail': 'Server is shutting down, please retry.'},
+                status_code=503,
+                headers={'Retry-After': '1', 'Connection': 'close'},
+            )
+            await response(scope, receive, send)
+            return
+
+        self.lifecycle.in_flight += 1
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.lifecycle.in_flight -= 1
@@ -0,0 +1,60 @@
+import time
+
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from miniTicktok_api.metrics import HTTP_REQUEST_DURATION, HTTP_REQUESTS_IN_FLIGHT, HTTP_RESPONSES, current_route
+
+
+class MetricsMiddleware:
+    """
+    Records the latency, in-flight count and response status of every HTTP request.
+
+    Requests are labelled with the path template of the route they match, such as `/feed_post/{post_id}`,
+    so that the number of series stays bounded. Requests matching no route share the `<unmatched>` label.
+    The template is also published in `current_route` for the code handling the request.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        method = scope['method']
+        route = self._route(scope)
+        current_route.set(route)
+        status_code = 500
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+
+            await send(message)
+
+        in_flight = HTTP_REQUESTS_IN_FLIGHT.labels(method, route)
+        in_flight.inc()
+        started_at = time.perf_counter()
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUEST_DURATION.labels(method, route).observe(time.perf_counter() - started_at)
+            HTTP_RESPONSES.labels(method, route, str(status_code)).inc()
+            in_flight.dec()
+
+    @staticmethod
+    def _route(scope: Scope) -> str:
+        app = scope.get('app')
+
+        for route in getattr(app, 'routes', ()):
+            match, _ = route.matches(scope)
+
+            if match == Match.FULL:
+                return route.path
+
+        return '<unmatched>'
@@ -0,0 +1,73 @@
+import cProfile
+import random
+from typing import Optional
+from uuid import uuid4
+
+from starlette.concurrency import run_in_threadpool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from miniTicktok_api import profiling
+
+
+class ProfilingMiddleware:
+    """
+    Profiles single requests with cProfile when they carry a valid signed `X-Profile` header, or at random
+    with probability `sample_rate`.
+
+    The profile is saved in the pstats format under `directory` and its id returned in the `X-Profile-Id`
+    header. Only one request is profiled at a time. The profiler sees everything running on the event loop
+    meanwhile, so profile under low concurrency for a clean picture.
+    """
+
+    def __init__(
+            self,
+            app: ASGIApp,
+            secret: Optional[str],
+            sample_rate: float,
+            directory: str,
+            max_files: int,
+    ):
+        self.app = app
+        self.secret = secret
+        self.sample_rate = sample_rate
+        self.directory = directory
+        self.max_files = max_files
+        self._active = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http' or self._active or not self._triggered(scope):
+            await self.app(scope, receive, send)
+            return
+
+        self._active = True
+        profile_id = uuid4().hex
+        profiler = cProfile.Profile()
+
+        async def send_wrapper(message: Message):
+            if message['type'] == 'http.response.start':
+                message['headers'] = [*message.get('headers', ()), (b'x-profile-id', profile_id.encode())]
+
+            await send(message)
+
+        profiler.enable()
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.disable()
+            self._active = False
+
+            await run_in_threadpool(profiling.save_profile, profiler, self.directory, profile_id, self.max_files)
+
+    def _triggered(self, scope: Scope) -> bool:
+        if self.sample_rate and random.random() < self.sample_rate:
+            return True
+
+        if not self.secret:
+            return False
+
+        for name, value in scope['headers']:
+            if name == b'x-profile':
+                return profiling.verify(self.secret, value.decode('latin-1'))
+
+        return False
@@ -0,0 +1,56 @@
+from fastapi import HTTPException
+from starlette import status
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Room for the multipart boundaries and part headers around the uploaded file.
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Caps the request body of uploads to `path` at `max_bytes` plus the multipart overhead, while it is received.
+
+    The multipart parser spools a whole upload to disk before the route runs, so the route alone could only
+    reject an oversized upload once it was fully received. Requests declaring a larger `Content-Length` are
+    rejected with a 413 straight away, others as soon as they send more than allowed.
+    """
+
+    def __init__(self, app: ASGIApp, path: str, max_bytes: int):
+        self.app = app
+        self.path = path
+        self.max_bytes = max_bytes
+        self.limit = max_bytes + MULTIPART_OVERHEAD_BYTES
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http' or scope['method'] != 'POST' or scope['path'] != self.path:
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope['headers']).get(b'content-length')
+
+        if content_length and content_length.isdigit() and int(content_length) > self.limit:
+            response = JSONResponse({'detail': self._detail()}, status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                                    headers={'Connection': 'close'})
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def receive_limited() -> Message:
+            nonlocal received
+
+            message = await receive()
+
+            if message['type'] == 'http.request':
+                received += len(message.get('body', b''))
+
+                if received > self.limit:
+                    raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=self._detail())
+
+            return message
+
+        await self.app(scope, receive_limited, send)
+
+    def _detail(self) -> str:
+        return f'Upload exceeds the maximum size of {self.max_bytes} bytes.'
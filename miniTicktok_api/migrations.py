@@ -0,0 +1,47 @@
+"""
+One-off data migrations, run as a deploy step before applying the indexes:
+
+    python -m miniTicktok_api.migrations refresh-tokens
+    python -m miniTicktok_api.indexes apply
+
+`refresh-tokens` deletes refresh tokens stored in the format from before token families were rotated in
+place. They cannot be rotated anymore, and their duplicate `token_family` values block the unique index.
+Their users have to log in again.
+"""
+import argparse
+import sys
+from typing import Callable, Dict, List
+
+from pymongo.database import Database
+
+
+def delete_legacy_refresh_tokens(database: Database) -> int:
+    '''rows without a refresh token hash, they stored the raw tokens with one row per token'''
+
+    result = database.get_collection('refresh_tokens').delete_many({'refresh_token_hash': {'$exists': False}})
+
+    return result.deleted_count
+
+
+MIGRATIONS: Dict[str, Callable[[Database], int]] = {
+    'refresh-tokens': delete_legacy_refresh_tokens,
+}
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m miniTicktok_api.migrations')
+    parser.add_argument('migration', choices=list(MIGRATIONS))
+    args = parser.parse_args(argv)
+
+    from miniTicktok_api.config import config
+    from miniTicktok_api.external.mongodb import MongodbDatabase
+
+    database = MongodbDatabase(uri=config.db_uri, database=config.db_default_database).database
+
+    print(f'{args.migration}: {MIGRATIONS[args.migration](database)} documents changed')
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
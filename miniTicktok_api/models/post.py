@@ -1,6 +1,6 @@
 from uuid import UUID, uuid4
 from datetime import datetime
-from pydantic import BaseModel, Field, HttpUrl
+from pydantic import AnyHttpUrl, BaseModel, Field
 from typing import Optional
 from enum import Enum
 
@@ -39,7 +39,7 @@ class Post(BaseModel):
     location: Optional[str] = Field(
         max_length=50, description="Location of the video")
 
-    video_uri: HttpUrl = Field(description='URI for the video recording.')
+    video_uri: AnyHttpUrl = Field(description='URI for the video recording.')
 
     post_type: PostType = Field(
         default=PostType.PUBLIC,
@@ -1,6 +1,8 @@
 from datetime import datetime
+from enum import Enum
+from typing import Optional
 from uuid import uuid4, UUID
-from pydantic import Field, HttpUrl, BaseModel
+from pydantic import AnyHttpUrl, Field, BaseModel
 
 
 class VideoRecording(BaseModel):
@@ -18,4 +20,71 @@ class VideoRecording(BaseModel):
 
     uploaded_by_user_id: UUID = Field(description='The ID of user who uploaded the video.')
 
-    video_uri: HttpUrl = Field(description='URI for the video')
+    video_uri: AnyHttpUrl = Field(description='URI for the video')
+
+    storage_key: Optional[str] = Field(description='The key of the video file in the storage backend.')
+
+    content_sha256: Optional[str] = Field(description='SHA-256 of the video file content.')
+
+
+class StoredVideo(BaseModel):
+    """A video file in the storage backend, shared by every recording with the same content."""
+
+    content_sha256: str = Field(description='SHA-256 of the video file content.')
+
+    created_at: datetime = Field(
+        default_factory=datetime.utcnow,
+        description='Datetime of when the file was stored.'
+    )
+
+    storage_key: str = Field(description='The key of the video file in the storage backend.')
+
+    video_uri: AnyHttpUrl = Field(description='URI for the video')
+
+    ref_count: int = Field(default=0, description='The number of video recordings referencing the file.')
+
+
+class VideoUploadStatus(str, Enum):
+    """The status of a background video upload."""
+
+    QUEUED = 'queued'
+    UPLOADING = 'uploading'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+
+
+class VideoUploadJob(BaseModel):
+    """A background job uploading a video to the storage backend."""
+
+    id: UUID = Field(
+        default_factory=uuid4,
+        description='The ID of the job.'
+    )
+
+    created_at: datetime = Field(
+        default_factory=datetime.utcnow,
+        description='Datetime of when the job was created.'
+    )
+
+    updated_at: datetime = Field(
+        default_factory=datetime.utcnow,
+        description='Datetime of when the job was last updated.'
+    )
+
+    user_id: UUID = Field(description='The ID of the user who uploaded the video.')
+
+    status: VideoUploadStatus = Field(
+        default=VideoUploadStatus.QUEUED,
+        description='The status of the upload.'
+    )
+
+    attempts: int = Field(default=0, description='The number of upload attempts made so far.')
+
+    video_recording_id: UUID = Field(
+        default_factory=uuid4,
+        description='The ID of the video recording created once the upload completes.'
+    )
+
+    video_uri: Optional[AnyHttpUrl] = Field(description='URI for the video, once the upload completed.')
+
+    error: Optional[str] = Field(description='The last upload error, if any.')
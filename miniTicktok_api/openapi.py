@@ -0,0 +1,58 @@
+"""
+The prebuilt OpenAPI schema, served instead of a generated one when `startup_mode` is 'fast'.
+
+    python -m miniTicktok_api.openapi build   # write miniTicktok_api/docs/openapi.json
+    python -m miniTicktok_api.openapi check   # exit with 1 when it does not match the routes anymore
+
+Rebuild it as part of the build whenever routes or models change.
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import List
+
+SCHEMA_PATH = Path(__file__).parent / 'docs' / 'openapi.json'
+
+
+def build_schema() -> dict:
+    from fastapi.openapi.utils import get_openapi
+
+    from miniTicktok_api.app import app
+    from miniTicktok_api.docs.docs import load_api_readme, load_api_tags
+
+    schema = get_openapi(
+        title=app.title,
+        version=app.version,
+        openapi_version=app.openapi_version,
+        description=load_api_readme(),
+        routes=app.routes,
+        tags=load_api_tags(),
+    )
+
+    return json.loads(json.dumps(schema))
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m miniTicktok_api.openapi')
+    parser.add_argument('command', choices=['build', 'check'])
+    args = parser.parse_args(argv)
+
+    schema = build_schema()
+
+    if args.command == 'build':
+        with open(SCHEMA_PATH, 'w') as schema_file:
+            json.dump(schema, schema_file, indent=2)
+            schema_file.write('\n')
+
+        return 0
+
+    if not SCHEMA_PATH.exists() or json.loads(SCHEMA_PATH.read_text()) != schema:
+        print(f'{SCHEMA_PATH} is out of date, run `python -m miniTicktok_api.openapi build`.', file=sys.stderr)
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,45 @@
+from typing import Dict, Iterable
+from uuid import UUID
+
+from miniTicktok_api.cache import TTLCache
+from miniTicktok_api.config import config
+from miniTicktok_api.external.mongodb import AsyncMongodbDatabase
+from miniTicktok_api.metrics import stats_collector
+from miniTicktok_api.models.users import PublicUser
+from miniTicktok_api.routes.utils import construct_trusted
+from miniTicktok_api.services import services
+
+PUBLIC_USER_PROJECTION = {'_id': 0, **{field: 1 for field in PublicUser.__fields__}}
+
+public_user_cache = TTLCache(
+    max_size=config.public_user_cache_size,
+    ttl=config.public_user_cache_ttl_seconds,
+)
+stats_collector.register('public_user_cache', public_user_cache.stats)
+
+
+async def get_public_profiles(user_ids: Iterable[UUID]) -> Dict[UUID, PublicUser]:
+    """Resolve public profiles by id, using the cache first and one `$in` query for the rest."""
+
+    profiles: Dict[UUID, PublicUser] = {}
+    missing = []
+
+    for user_id in set(user_ids):
+        profile = public_user_cache.get(user_id)
+
+        if profile is None:
+            missing.append(user_id)
+        else:
+            profiles[user_id] = profile
+
+    if not missing:
+        return profiles
+
+    users_collection = services.get(AsyncMongodbDatabase).database.get_collection('users')
+
+    async for profile_data in users_collection.find({'id': {'$in': missing}}, PUBLIC_USER_PROJECTION):
+        profile = construct_trusted(PublicUser, profile_data)
+        public_user_cache.set(profile.id, profile)
+        profiles[profile.id] = profile
+
+    return profiles
@@ -0,0 +1,106 @@
+"""
+Storage and signing of per-request CPU profiles, see `ProfilingMiddleware`.
+
+A request is profiled on demand when it carries an `X-Profile` header signed with `profiling_secret`:
+
+    python -m miniTicktok_api.profiling sign --ttl-seconds 600
+"""
+import argparse
+import cProfile
+import hashlib
+import hmac
+import os
+import re
+import sys
+import time
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+_PROFILE_ID = re.compile(r'^[0-9a-f]{32}$')
+
+
+class ProfileInfo(BaseModel):
+    id: str
+    size: int
+    created_at: datetime
+
+
+def _signature(secret: str, expires_at: int) -> str:
+    return hmac.new(secret.encode(), str(expires_at).encode(), hashlib.sha256).hexdigest()
+
+
+def sign(secret: str, ttl_seconds: int) -> str:
+    """A value for the `X-Profile` header, valid for `ttl_seconds`."""
+
+    expires_at = int(time.time()) + ttl_seconds
+    return f'{expires_at}.{_signature(secret, expires_at)}'
+
+
+def verify(secret: str, value: str) -> bool:
+    expires_at, _, signature = value.partition('.')
+
+    if not expires_at.isdigit() or int(expires_at) < time.time():
+        return False
+
+    return hmac.compare_digest(signature, _signature(secret, int(expires_at)))
+
+
+def profile_path(directory: str, profile_id: str) -> Optional[str]:
+    if not _PROFILE_ID.match(profile_id):
+        return None
+
+    path = os.path.join(directory, f'{profile_id}.prof')
+
+    return path if os.path.isfile(path) else None
+
+
+def list_profiles(directory: str) -> List[ProfileInfo]:
+    if not os.path.isdir(directory):
+        return []
+
+    profiles = [
+        ProfileInfo(
+            id=entry.name[:-len('.prof')],
+            size=entry.stat().st_size,
+            created_at=datetime.utcfromtimestamp(entry.stat().st_mtime),
+        )
+        for entry in os.scandir(directory) if entry.is_file() and entry.name.endswith('.prof')
+    ]
+
+    return sorted(profiles, key=lambda profile: profile.created_at, reverse=True)
+
+
+def save_profile(profiler: cProfile.Profile, directory: str, profile_id: str, max_files: int):
+    """Write the profile in the pstats format, dropping the oldest ones beyond `max_files`."""
+
+    os.makedirs(directory, exist_ok=True)
+    profiler.dump_stats(os.path.join(directory, f'{profile_id}.prof'))
+
+    for profile in list_profiles(directory)[max_files:]:
+        try:
+            os.remove(os.path.join(directory, f'{profile.id}.prof'))
+        except FileNotFoundError:
+            pass
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m miniTicktok_api.profiling')
+    parser.add_argument('command', choices=['sign'])
+    parser.add_argument('--ttl-seconds', type=int, default=600)
+    args = parser.parse_args(argv)
+
+    from miniTicktok_api.config import config
+
+    if not config.profiling_secret:
+        print('APP_PROFILING_SECRET is not set.', file=sys.stderr)
+        return 1
+
+    print(sign(config.profiling_secret, args.ttl_seconds))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
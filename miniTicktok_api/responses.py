@@ -0,0 +1,139 @@
+import os
+import re
+from typing import Any, BinaryIO, Mapping, Optional, Tuple
+
+import orjson
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, Response
+from starlette.types import Receive, Scope, Send
+
+_RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _orjson_default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.__dict__
+
+    raise TypeError
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    A JSON response rendered with orjson.
+
+    Pydantic models in the content are written out from their field values as they are, without being
+    validated or converted to dicts first, so only use it for trusted content such as models built from our
+    own database documents.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_orjson_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def parse_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range `Range` header into an inclusive `(start, end)` byte range.
+
+    Returns `None` when the whole file should be sent and raises `ValueError` when the range is unsatisfiable.
+    Multi-range requests are answered with the whole file, which RFC 7233 allows.
+    """
+
+    if not range_header:
+        return None
+
+    match = _RANGE_PATTERN.match(range_header.strip())
+
+    if not match or match.group(1) == match.group(2) == '':
+        return None
+
+    if match.group(1) == '':
+        start, end = max(size - int(match.group(2)), 0), size - 1
+    else:
+        start = int(match.group(1))
+        end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+
+    if start >= size or start > end:
+        raise ValueError(range_header)
+
+    return start, end
+
+
+class RangeFileResponse(Response):
+    """
+    Sends a file, or the single byte range of it requested in a `Range` header, as a `206` partial response.
+
+    It takes the file already open and closes it once sent, so the file can be removed in between without
+    breaking the response after its headers went out.
+
+    When the server supports the ASGI zero-copy send extension the body is handed to `sendfile`, otherwise it is
+    streamed in fixed-size chunks.
+    """
+
+    chunk_size = 256 * 1024
+
+    def __init__(
+            self,
+            file: BinaryIO,
+            range_header: Optional[str] = None,
+            headers: Optional[Mapping[str, str]] = None,
+            media_type: Optional[str] = None,
+    ):
+        self.file = file
+        self.media_type = media_type
+        self.background = None
+
+        size = os.fstat(file.fileno()).st_size
+        headers = {**(headers or {}), 'accept-ranges': 'bytes'}
+
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            self.status_code = 416
+            self.offset, self.count = 0, 0
+            self.init_headers({**headers, 'content-range': f'bytes */{size}', 'content-length': '0'})
+            return
+
+        if byte_range is None:
+            self.status_code = 200
+            self.offset, self.count = 0, size
+        else:
+            self.status_code = 206
+            self.offset, self.count = byte_range[0], byte_range[1] - byte_range[0] + 1
+            headers['content-range'] = f'bytes {byte_range[0]}-{byte_range[1]}/{size}'
+
+        headers['content-length'] = str(self.count)
+        self.init_headers(headers)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        with self.file as file:
+            await send({'type': 'http.response.start', 'status': self.status_code, 'headers': self.raw_headers})
+
+            if scope['method'] == 'HEAD' or self.count == 0:
+                await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+                return
+
+            if 'http.response.zerocopysend' in scope.get('extensions', {}):
+                await send({
+                    'type': 'http.response.zerocopysend',
+                    'file': file,
+                    'offset': self.offset,
+                    'count': self.count,
+                    'more_body': False,
+                })
+                return
+
+            file.seek(self.offset)
+            remaining = self.count
+
+            while remaining:
+                chunk = await run_in_threadpool(file.read, min(self.chunk_size, remaining))
+
+                if not chunk:
+                    break
+
+                remaining -= len(chunk)
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': remaining > 0})
+
+            if remaining:
+                await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
@@ -0,0 +1,87 @@
+import hmac
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from fastapi.responses import FileResponse
+from starlette import status
+
+from miniTicktok_api import profiling
+from miniTicktok_api.config import config
+from miniTicktok_api.profiling import ProfileInfo
+from miniTicktok_api.slow_queries import SlowQuery, slow_query_report
+
+
+# =============== Private Methods =============== #
+
+
+async def _require_admin_token(x_admin_token: Optional[str] = Header(default=None)):
+    '''the admin endpoints do not exist unless an admin token is configured'''
+
+    if not config.admin_token:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, config.admin_token):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid admin token.")
+
+
+# =================== Router ==================== #
+
+
+router = APIRouter(
+    prefix='/admin',
+    tags=['Admin'],
+    dependencies=[Depends(_require_admin_token)],
+    include_in_schema=False,
+)
+
+# ================== Endpoints ================== #
+
+
+@router.get(
+    path='/slow_queries',
+    description='The slow MongoDB commands seen by this process, aggregated by collection, command, '
+                'filter shape and route. Explained entries carry their winning plan.',
+    response_model=List[SlowQuery],
+)
+async def get_slow_queries(
+        collection: Optional[str] = None,
+        route: Optional[str] = None,
+        collscan: Optional[bool] = None,
+        sort_by: str = Query(default='total_ms', regex='^(total_ms|max_ms|mean_ms|count|last_seen)$'),
+        limit: int = Query(default=50, ge=1, le=500),
+) -> List[SlowQuery]:
+    return slow_query_report.query(collection=collection, route=route, collscan=collscan, sort_by=sort_by,
+                                   limit=limit)
+
+
+@router.delete(
+    path='/slow_queries',
+    description='Reset the slow query report.',
+    status_code=status.HTTP_204_NO_CONTENT,
+)
+async def clear_slow_queries():
+    slow_query_report.clear()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@router.get(
+    path='/profiles',
+    description='The stored request profiles, newest first.',
+    response_model=List[ProfileInfo],
+)
+async def get_profiles() -> List[ProfileInfo]:
+    return profiling.list_profiles(config.profiling_dir)
+
+
+@router.get(
+    path='/profiles/{profile_id}',
+    description='Download a request profile in the pstats format, as named by the `X-Profile-Id` header.',
+    response_class=FileResponse,
+)
+async def get_profile(profile_id: str) -> FileResponse:
+    path = profiling.profile_path(config.profiling_dir, profile_id)
+
+    if not path:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found.")
+
+    return FileResponse(path, media_type='application/octet-stream', filename=f'{profile_id}.prof')
@@ -2,13 +2,12 @@ from typing import Optional, Union
 from uuid import UUID
 
 from fastapi import APIRouter, Depends, HTTPException, Form
-from jose import jwt, ExpiredSignatureError
 from starlette import status
 
-from miniTicktok_api.auth import RefreshToken, AccessToken, generate_access_token, new_access_token_from_refresh_token
+from miniTicktok_api.auth import AccessToken, generate_access_token, rotate_refresh_token
 from miniTicktok_api.config import config
-from miniTicktok_api.crpyto import verify_password
-from miniTicktok_api.external.mongodb import MongodbDatabase
+from miniTicktok_api.crpyto import verify_password_async
+from miniTicktok_api.external.mongodb import AsyncMongodbDatabase
 from miniTicktok_api.models.users import User
 from miniTicktok_api.services import services
 
@@ -47,62 +46,57 @@ class OAuth2RequestForm:
 # =============== Private Methods =================== #
 
 
-def _authenticate_user(email: str, password: str) -> Union[bool, User]:
-    user_data = services.get(MongodbDatabase).database.get_collection('users').find_one({"email": email})
+async def _authenticate_user(email: str, password: str) -> Union[bool, User]:
+    user_data = await services.get(AsyncMongodbDatabase).database.get_collection('users').find_one({"email": email})
 
     if not user_data:
         return False
 
     user = User.parse_obj(user_data)
 
-    if not verify_password(password, user.password):
+    if not await verify_password_async(password, user.password):
         return False
 
     return user
 
 
-def _purge_refresh_tokens(token_family: UUID):
-    refresh_tokens_collection = services.get(MongodbDatabase).database.get_collection('refresh_tokens')
-    refresh_tokens_collection.update_many({"token_family": token_family}, {'$set': {'invalidated': True}})
+async def _purge_refresh_tokens(token_family: UUID):
+    refresh_tokens_collection = services.get(AsyncMongodbDatabase).database.get_collection('refresh_tokens')
+    await refresh_tokens_collection.update_one({"token_family": token_family}, {'$set': {'invalidated': True}})
 
 
-def _refresh_token(refresh_token: str) -> AccessToken:
-    refresh_tokens_collection = services.get(MongodbDatabase).database.get_collection('refresh_tokens')
-    refresh_token_data = refresh_tokens_collection.find_one({"refresh_token": refresh_token})
-
-    if not refresh_token_data:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Old refresh token not found.",
-        )
-
-    old_refresh_token = RefreshToken.parse_obj(refresh_token_data)
+async def _refresh_token(refresh_token: str) -> AccessToken:
+    from jose import jwt, ExpiredSignatureError, JWTError
 
     try:
-        jwt.decode(old_refresh_token.refresh_token, config.jwt_secret, algorithms=[config.jwt_algorithm])
+        payload = jwt.decode(refresh_token, config.jwt_secret, algorithms=[config.jwt_algorithm])
+        token_family = UUID(payload["sub"])
     except ExpiredSignatureError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Refresh token expired.",
         )
+    except (JWTError, KeyError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Old refresh token not found.",
+        )
+
+    access_token = await rotate_refresh_token(token_family, refresh_token)
 
-    if old_refresh_token.used or old_refresh_token.invalidated:
-        _purge_refresh_tokens(old_refresh_token.token_family)
+    if not access_token:
+        await _purge_refresh_tokens(token_family)
 
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Refresh token already used or invalidated.",
         )
 
-    old_refresh_token.used = True
-    refresh_tokens_collection.replace_one(
-        {"refresh_token": old_refresh_token.refresh_token}, old_refresh_token.dict())
-
-    return new_access_token_from_refresh_token(old_refresh_token)
+    return access_token
 
 
-def _access_token(form_data: OAuth2RequestForm):
-    user = _authenticate_user(form_data.username, form_data.password)
+async def _access_token(form_data: OAuth2RequestForm):
+    user = await _authenticate_user(form_data.username, form_data.password)
 
     if not user:
         raise HTTPException(
@@ -111,7 +105,7 @@ def _access_token(form_data: OAuth2RequestForm):
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    return generate_access_token(user)
+    return await generate_access_token(user)
 
 
 # ================== Endpoints ================== #
@@ -119,7 +113,7 @@ def _access_token(form_data: OAuth2RequestForm):
 
 @router.post(
     "/token",
-    response_model=Union[AccessToken, RefreshToken],
+    response_model=AccessToken,
     description='Create an access token and a refresh token.',
 )
 async def oauth_token(form_data: OAuth2RequestForm = Depends()) -> AccessToken:
@@ -130,6 +124,6 @@ async def oauth_token(form_data: OAuth2RequestForm = Depends()) -> AccessToken:
                 detail='Missing "refresh_token" field.',
             )
 
-        return _refresh_token(form_data.refresh_token)
+        return await _refresh_token(form_data.refresh_token)
 
-    return _access_token(form_data)
+    return await _access_token(form_data)
@@ -0,0 +1,37 @@
+from fastapi import APIRouter
+from starlette import status
+
+from miniTicktok_api.lifecycle import lifecycle
+from miniTicktok_api.responses import FastJSONResponse
+
+# =================== Router ==================== #
+
+
+router = APIRouter(
+    prefix='/health',
+    tags=['Monitoring'],
+    include_in_schema=False,
+)
+
+# ================== Endpoints ================== #
+
+
+@router.get(
+    path='/live',
+    description='Whether the worker is running. It answers as long as its event loop does.',
+)
+async def get_liveness() -> FastJSONResponse:
+    return FastJSONResponse({'status': 'alive'})
+
+
+@router.get(
+    path='/ready',
+    description='Whether the worker has started, is not shutting down and its services are healthy.',
+)
+async def get_readiness() -> FastJSONResponse:
+    ready, checks = await lifecycle.readiness()
+
+    return FastJSONResponse(
+        {'status': 'ready' if ready else 'unavailable', 'checks': checks},
+        status_code=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
@@ -0,0 +1,34 @@
+import os
+
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, generate_latest
+from prometheus_client.multiprocess import MultiProcessCollector
+
+from miniTicktok_api.metrics import stats_collector
+
+# =================== Router ==================== #
+
+
+router = APIRouter(
+    tags=['Monitoring'],
+)
+
+# ================== Endpoints ================== #
+
+
+@router.get(
+    path='/metrics',
+    description='Metrics in the Prometheus text format.',
+    include_in_schema=False,
+)
+async def get_metrics() -> Response:
+    registry = REGISTRY
+
+    # Set by the production server, which runs several workers: report the metrics of all of them, plus the
+    # pool and cache statistics of the worker serving this scrape.
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        MultiProcessCollector(registry)
+        registry.register(stats_collector.with_labels(pid=str(os.getpid())))
+
+    return Response(content=generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
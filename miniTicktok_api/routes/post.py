@@ -1,17 +1,25 @@
 from uuid import UUID
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Response
 from pydantic import BaseModel, Field
 from starlette import status
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
+from miniTicktok_api import counters
 from miniTicktok_api.auth import get_current_user
-from miniTicktok_api.external.mongodb import MongodbDatabase
+from miniTicktok_api.cache import TTLCache
+from miniTicktok_api.config import config
+from miniTicktok_api.external.mongodb import AsyncMongodbDatabase
+from miniTicktok_api.metrics import FEED_STAGE_DURATION, stats_collector
 from miniTicktok_api.models.post import Post, PostType
-from miniTicktok_api.models.users import User, PublicUser
+from miniTicktok_api.models.users import User
 from miniTicktok_api.models.videos import VideoRecording
+from miniTicktok_api.profiles import get_public_profiles
+from miniTicktok_api.responses import FastJSONResponse
 from miniTicktok_api.services import services
-from miniTicktok_api.routes.utils import PaginatedList, ITEMS_PER_PAGE_DEFAULT
+from miniTicktok_api.routes.utils import PaginatedList, ITEMS_PER_PAGE_DEFAULT, KEYSET_SORT, BatchList, BatchRequest, \
+    construct_trusted, encode_cursor, keyset_filter
 
-from pydantic import BaseModel, Field, HttpUrl
+from pydantic import AnyHttpUrl, BaseModel, Field
 from uuid import uuid4
 
 
@@ -24,6 +32,14 @@ router = APIRouter(
     dependencies=[Depends(get_current_user)],
 )
 
+# Rendered JSON of the head pages of the public feed, keyed by page number.
+# Creating a public post clears it, other workers catch up once their entries expire.
+public_feed_cache = TTLCache(
+    max_size=config.public_feed_cache_pages,
+    ttl=config.public_feed_cache_ttl_seconds,
+)
+stats_collector.register('public_feed_cache', public_feed_cache.stats)
+
 # =============== Response Models =============== #
 
 
@@ -32,7 +48,7 @@ class CreatePostRequest(BaseModel):
     title: Optional[str] = Field(
         description='The title of the video post.', max_length=40)
 
-    video_uri: HttpUrl = Field(description='URI for the video recording.')
+    video_uri: AnyHttpUrl = Field(description='URI for the video recording.')
 
     location: Optional[str] = Field(
         max_length=50, description="Location of the video")
@@ -53,103 +69,188 @@ class PostDetails(Post):
 # =============== Private Methods =============== #
 
 
-def _get_post(post_id: UUID) -> Post:
+async def _get_post(post_id: UUID) -> PostDetails:
     posts_collection = services.get(
-        MongodbDatabase).database.get_collection('posts')
-    post_data = posts_collection.find_one({"id":  post_id})
+        AsyncMongodbDatabase).database.get_collection('posts')
+    post_data = await posts_collection.find_one({"id":  post_id, "deleted_at": None})
 
     if not post_data:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Post not found.")
 
-    post: Post = Post.parse_obj(post_data)
+    post: PostDetails = construct_trusted(PostDetails, post_data)
 
     return post
 
 
-def _get_profile_data(user_id: UUID) -> PublicUser:
-    '''retrive public profile of any specific user'''
+async def _count_posts(query: dict, counter_key: str) -> int:
+    '''count the posts matching the query, from a maintained counter unless configured otherwise'''
+
+    posts_collection = services.get(AsyncMongodbDatabase).database.get_collection('posts')
+
+    if config.post_count_mode == 'exact':
+        return await posts_collection.count_documents(query)
+
+    post_count = await counters.get_count(counter_key)
+
+    if post_count is None:
+        post_count = await posts_collection.count_documents(query)
+        await counters.seed(counter_key, post_count)
+
+    return post_count
+
+
+async def _find_posts_page(
+        query: dict,
+        counter_key: str,
+        page: int,
+        cursor: Optional[str],
+) -> Tuple[List[PostDetails], Optional[int], Optional[str]]:
+    '''fetch a single page of posts, by page number or by keyset cursor when one is given'''
+
+    posts_collection = services.get(AsyncMongodbDatabase).database.get_collection('posts')
+    post_count = None
+
+    if cursor:
+        posts_data = posts_collection \
+            .find({**query, **keyset_filter(cursor)}, sort=KEYSET_SORT) \
+            .limit(ITEMS_PER_PAGE_DEFAULT + 1)
+    else:
+        post_count = await _count_posts(query, counter_key)
+        posts_data = posts_collection \
+            .find(query, sort=KEYSET_SORT) \
+            .skip((page - 1) * ITEMS_PER_PAGE_DEFAULT) \
+            .limit(ITEMS_PER_PAGE_DEFAULT + 1)
+
+    posts: List[PostDetails] = [construct_trusted(PostDetails, post_data) async for post_data in posts_data]
+    next_cursor = None
+
+    if len(posts) > ITEMS_PER_PAGE_DEFAULT:
+        posts = posts[:ITEMS_PER_PAGE_DEFAULT]
+        next_cursor = encode_cursor(posts[-1].created_at, posts[-1].id)
+
+    return posts, post_count, next_cursor
+
+
+def _create_posts_list(
+        posts: List[PostDetails],
+        page: int,
+        post_count: Optional[int],
+        next_cursor: Optional[str],
+) -> PaginatedList[PostDetails]:
+    if post_count is None:
+        return PaginatedList[PostDetails].create_cursor_list(
+            items=posts,
+            next_cursor=next_cursor,
+            items_per_page=ITEMS_PER_PAGE_DEFAULT,
+        )
 
-    profile_collection = services.get(MongodbDatabase).database.get_collection('users')
-    profile_data = profile_collection.find_one({"id":  user_id})
-    profile:  PublicUser = PublicUser.parse_obj(profile_data)
-    return profile
+    return PaginatedList[PostDetails].create_list(
+        items=posts,
+        current_page=page,
+        total_items=post_count,
+        items_per_page=ITEMS_PER_PAGE_DEFAULT,
+        next_cursor=next_cursor,
+    )
 
 
 # ================== Endpoints ================== #
 
 
+@router.post(
+    path='/batch',
+    description='Get details about several posts at once. '
+                'Results are returned in request order, with `found` set to false for unknown IDs.',
+    response_model=BatchList[PostDetails],
+    response_class=FastJSONResponse,
+)
+async def get_posts_batch(request: BatchRequest) -> FastJSONResponse:
+    posts_collection = services.get(AsyncMongodbDatabase).database.get_collection('posts')
+    posts_data = posts_collection.find({"id": {"$in": request.ids}, "deleted_at": None}, {"_id": 0})
+
+    posts: Dict[UUID, PostDetails] = {}
+
+    async for post_data in posts_data:
+        post: PostDetails = construct_trusted(PostDetails, post_data)
+        posts[post.id] = post
+
+    profiles = await get_public_profiles(post.from_user_id for post in posts.values())
+
+    for post in posts.values():
+        profile_data = profiles.get(post.from_user_id)
+        post.username = profile_data.username if profile_data else None
+
+    return FastJSONResponse(BatchList[PostDetails].create_list(request.ids, posts))
+
+
 @router.get(
     path='/{post_id}',
     description='Get details about a specific post.',
     response_model=PostDetails,
+    response_class=FastJSONResponse,
 )
-async def get_post(post_id: UUID) -> PostDetails:
-    post_data = _get_post(post_id)
-    post: PostDetails = PostDetails.parse_obj(post_data)
-    return post
+async def get_post(post_id: UUID) -> FastJSONResponse:
+    post = await _get_post(post_id)
+    return FastJSONResponse(post)
 
 
 @router.get(
     path='/profiles/me',
-    description='Get all the posts by the authenticated user.',
+    description='Get all the posts by the authenticated user. '
+                'Pass the `next_cursor` of a previous page as `cursor` to paginate without page numbers.',
     response_model=PaginatedList[PostDetails],
+    response_class=FastJSONResponse,
 )
-async def get_posts(page: int = 1, user: User = Depends(get_current_user)) -> PaginatedList[PostDetails]:
-    posts: List[PostDetails] = []
-    posts_collection = services.get(MongodbDatabase).database.get_collection('posts')
-
-    skip = (page - 1) * ITEMS_PER_PAGE_DEFAULT
-    post_count = posts_collection.count_documents({"from_user_id": user.id})
-
-    posts_data = posts_collection \
-        .find({"from_user_id": user.id}, sort=[('created_at', -1)]) \
-        .skip(skip) \
-        .limit(ITEMS_PER_PAGE_DEFAULT)
-
-    for post_data in posts_data:
-        post: PostDetails = PostDetails.parse_obj(post_data)
+async def get_posts(
+        page: int = 1,
+        cursor: Optional[str] = None,
+        user: User = Depends(get_current_user),
+) -> FastJSONResponse:
+    with FEED_STAGE_DURATION.labels('profile', 'query').time():
+        posts, post_count, next_cursor = await _find_posts_page(
+            {"from_user_id": user.id, "deleted_at": None}, counters.user_posts(user.id), page, cursor)
+
+    for post in posts:
         post.username = user.username
-        posts.append(post)
 
-    return PaginatedList[PostDetails].create_list(
-        items=posts,
-        current_page=page,
-        total_items=post_count,
-        items_per_page=ITEMS_PER_PAGE_DEFAULT,
-    )
+    with FEED_STAGE_DURATION.labels('profile', 'serialization').time():
+        return FastJSONResponse(_create_posts_list(posts, page, post_count, next_cursor))
 
 
 @router.get(
     path='',
-    description='Get feed of the authenticated user.',
+    description='Get feed of the authenticated user. '
+                'Pass the `next_cursor` of a previous page as `cursor` to paginate without page numbers.',
     response_model=PaginatedList[PostDetails],
+    response_class=FastJSONResponse,
 )
-async def get_public_feed(page: int = 1) -> PaginatedList[PostDetails]:
-    posts: List[PostDetails] = []
-    posts_collection = services.get(MongodbDatabase).database.get_collection('posts')
+async def get_public_feed(page: int = 1, cursor: Optional[str] = None) -> Response:
+    cacheable = not cursor and page <= config.public_feed_cache_pages
 
-    skip = (page - 1) * ITEMS_PER_PAGE_DEFAULT
+    if cacheable:
+        cached_page = public_feed_cache.get(page)
 
-    post_count = posts_collection.count_documents({"post_type": PostType.PUBLIC, })
+        if cached_page is not None:
+            return Response(content=cached_page, media_type=FastJSONResponse.media_type)
 
-    posts_data = posts_collection \
-        .find({"post_type": PostType.PUBLIC, }, sort=[('created_at', -1)]) \
-        .skip(skip) \
-        .limit(ITEMS_PER_PAGE_DEFAULT)
+    with FEED_STAGE_DURATION.labels('public', 'query').time():
+        posts, post_count, next_cursor = await _find_posts_page(
+            {"post_type": PostType.PUBLIC, "deleted_at": None}, counters.PUBLIC_POSTS, page, cursor)
 
-    for post_data in posts_data:
-        post: PostDetails = PostDetails.parse_obj(post_data)
-        profile_data = _get_profile_data(post.from_user_id)
-        post.username = profile_data.username
-        posts.append(post)
+    with FEED_STAGE_DURATION.labels('public', 'profiles').time():
+        profiles = await get_public_profiles(post.from_user_id for post in posts)
 
-    return PaginatedList[PostDetails].create_list(
-        items=posts,
-        current_page=page,
-        total_items=post_count,
-        items_per_page=ITEMS_PER_PAGE_DEFAULT,
-    )
+    for post in posts:
+        profile_data = profiles.get(post.from_user_id)
+        post.username = profile_data.username if profile_data else None
+
+    with FEED_STAGE_DURATION.labels('public', 'serialization').time():
+        response = FastJSONResponse(_create_posts_list(posts, page, post_count, next_cursor))
+
+    if cacheable:
+        public_feed_cache.set(page, response.body)
+
+    return response
 
 
 @router.post(
@@ -159,7 +260,7 @@ async def get_public_feed(page: int = 1) -> PaginatedList[PostDetails]:
 )
 async def create_post(request: CreatePostRequest, user: User = Depends(get_current_user)):
 
-    post_collection = services.get(MongodbDatabase).database.get_collection('posts')
+    post_collection = services.get(AsyncMongodbDatabase).database.get_collection('posts')
 
     post = Post(
         from_user_id=user.id,
@@ -169,10 +270,41 @@ async def create_post(request: CreatePostRequest, user: User = Depends(get_curre
         location=request.location,
     )
 
-    post_collection.insert_one(post.dict())
+    await post_collection.insert_one(post.dict())
+    await counters.increment(counters.user_posts(user.id))
+
+    if post.post_type == PostType.PUBLIC:
+        await counters.increment(counters.PUBLIC_POSTS)
+        public_feed_cache.clear()
 
     return post
 
+
+@router.delete(
+    path='/{post_id}',
+    description='Delete a post of the authenticated user.',
+    status_code=status.HTTP_204_NO_CONTENT,
+)
+async def delete_post(post_id: UUID, user: User = Depends(get_current_user)):
+    post_collection = services.get(AsyncMongodbDatabase).database.get_collection('posts')
+
+    post_data = await post_collection.find_one_and_update(
+        {"id": post_id, "from_user_id": user.id, "deleted_at": None},
+        {"$set": {"deleted_at": datetime.utcnow()}},
+    )
+
+    if not post_data:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Post not found.")
+
+    await counters.increment(counters.user_posts(user.id), -1)
+
+    if post_data['post_type'] == PostType.PUBLIC:
+        await counters.increment(counters.PUBLIC_POSTS, -1)
+        public_feed_cache.clear()
+
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
 # Note I know the goal was to to upload the video and metadata at the same request but
 # to upload video and get there url to be appended in feed post apis i have created separate api under routes/videos
 # the url which can be used to append in the feed post requests
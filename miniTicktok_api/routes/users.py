@@ -1,12 +1,21 @@
+import random
+import re
+from typing import List
+
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import Field, BaseModel
+from pymongo.errors import DuplicateKeyError
 from starlette import status
 
 from miniTicktok_api.auth import get_current_user
-from miniTicktok_api.crpyto import get_password_hash
-from miniTicktok_api.external.mongodb import MongodbDatabase
+from miniTicktok_api.config import config
+from miniTicktok_api.crpyto import get_password_hash_async
+from miniTicktok_api.external.mongodb import AsyncMongodbDatabase
 from miniTicktok_api.services import services
-from miniTicktok_api.models.users import User
+from miniTicktok_api.models.users import User, PublicUser
+from miniTicktok_api.profiles import get_public_profiles
+from miniTicktok_api.responses import FastJSONResponse
+from miniTicktok_api.routes.utils import BatchList, BatchRequest
 # =================== Router ==================== #
 
 
@@ -29,6 +38,21 @@ class CreateUserRequest(BaseModel):
     password_verification: str = Field(description="The same password for verification purposes.")
 
 
+# =============== Private Methods =============== #
+
+
+async def _free_discriminators(users_collection, username: str) -> List[int]:
+    '''discriminators not yet taken by an active user with this username, read from the tag index'''
+
+    taken_data = users_collection.find(
+        {'tag': {'$regex': f'^{re.escape(username)}#'}, 'deleted_at': None},
+        {'_id': 0, 'username_discriminator': 1},
+    )
+    taken = {user_data['username_discriminator'] async for user_data in taken_data}
+
+    return [discriminator for discriminator in range(1000, 10000) if discriminator not in taken]
+
+
 # ================== Endpoints ================== #
 
 
@@ -41,6 +65,20 @@ async def get_my_info(user: User = Depends(get_current_user)) -> User:
     return user
 
 
+@router.post(
+    path='/public/batch',
+    description='Get the public profiles of several users at once. '
+                'Results are returned in request order, with `found` set to false for unknown IDs.',
+    response_model=BatchList[PublicUser],
+    response_class=FastJSONResponse,
+    dependencies=[Depends(get_current_user)],
+)
+async def get_public_users_batch(request: BatchRequest) -> FastJSONResponse:
+    profiles = await get_public_profiles(request.ids)
+
+    return FastJSONResponse(BatchList[PublicUser].create_list(request.ids, profiles))
+
+
 @router.post(
     path='',
     description='Create a user. Use this to register new users manually without social-logins.',
@@ -53,34 +91,31 @@ async def create_user(request: CreateUserRequest) -> User:
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
                             detail="Passwords are not identical.")
 
-    password = get_password_hash(request.password)
+    password = await get_password_hash_async(request.password)
 
-    users_collection = services.get(MongodbDatabase).database.get_collection('users')
+    users_collection = services.get(AsyncMongodbDatabase).database.get_collection('users')
 
-    if users_collection.count_documents({'email': request.email, 'deleted_at': None}, limit=1) != 0:
-        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="E-mail already registered.")
-
-    has_unique_user_tag = False
-    tries = 0
-    user = None
-
-    while not has_unique_user_tag and tries < 30:
-        user = User(
-            email=request.email,
-            username=request.username,
-            password=password,
-        )
+    user = User(
+        email=request.email,
+        username=request.username,
+        password=password,
+    )
 
+    for _ in range(config.user_tag_allocation_attempts):
         user.tag = User.create_tag(username=user.username, username_discriminator=user.username_discriminator)
 
-        if users_collection.count_documents({'tag': user.tag, 'deleted_at': None}, limit=1) == 0:
-            has_unique_user_tag = True
+        try:
+            await users_collection.insert_one(user.dict())
+            return user
+        except DuplicateKeyError as e:
+            if 'email' in (e.details or {}).get('keyPattern', {}):
+                raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="E-mail already registered.")
 
-        tries += 1
+        free_discriminators = await _free_discriminators(users_collection, user.username)
 
-    if not user:
-        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Failed to create user.")
+        if not free_discriminators:
+            break
 
-    users_collection.insert_one(user.dict())
+        user.username_discriminator = random.choice(free_discriminators)
 
-    return user
+    raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Failed to create user.")
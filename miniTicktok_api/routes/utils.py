@@ -1,20 +1,79 @@
-from typing import TypeVar, Generic, List, Optional
-from pydantic import Field
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import TypeVar, Generic, List, Optional, Tuple, Type, Dict
+from uuid import UUID
+
+from fastapi import HTTPException
+from pydantic import BaseModel, Field
 from pydantic.generics import GenericModel
+from starlette import status
 
 DataT = TypeVar('DataT')
+ModelT = TypeVar('ModelT', bound=BaseModel)
 
 ITEMS_PER_PAGE_DEFAULT = 5
 
+BATCH_MAX_ITEMS = 100
+
+KEYSET_SORT = [('created_at', -1), ('id', -1)]
+
+
+def construct_trusted(model: Type[ModelT], data: dict) -> ModelT:
+    """
+    Build a model from a document read from our own database without validating it again.
+
+    Only the model's fields are taken from the document, missing ones get their default.
+    """
+
+    return model.construct(**{
+        name: data[name] if name in data else field.get_default()
+        for name, field in model.__fields__.items()
+    })
+
+
+def encode_cursor(created_at: datetime, item_id: UUID) -> str:
+    """Encode the `(created_at, id)` position of an item into an opaque cursor string."""
+
+    payload = json.dumps([created_at.isoformat(), str(item_id)], separators=(',', ':'))
+
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, item_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+
+        if not isinstance(created_at, str) or not isinstance(item_id, str):
+            raise ValueError('cursor items must be strings')
+
+        return datetime.fromisoformat(created_at), UUID(item_id)
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Invalid cursor.")
+
+
+def keyset_filter(cursor: str) -> dict:
+    """Filter matching every item that comes after the cursor in `KEYSET_SORT` order."""
+
+    created_at, item_id = decode_cursor(cursor)
+
+    return {'$or': [
+        {'created_at': {'$lt': created_at}},
+        {'created_at': created_at, 'id': {'$lt': item_id}},
+    ]}
+
 
 class PaginatedList(GenericModel, Generic[DataT]):
     items: List = Field(description='Items of the current page.')
     items_per_page: int = Field(description='The number of items displayed per page.')
-    current_page: int = Field(description='The current page.')
+    current_page: Optional[int] = Field(description='The current page. Not set in cursor mode.')
     previous_page: Optional[int] = Field(description='Previous page of the paginated list.')
     next_page: Optional[int] = Field(description='Next page of the paginated list.')
-    last_page: int = Field(description='The last page of the paginated list.')
-    total_items: int = Field(description='Total items in the whole list.')
+    last_page: Optional[int] = Field(description='The last page of the paginated list. Not set in cursor mode.')
+    total_items: Optional[int] = Field(description='Total items in the whole list. Not set in cursor mode.')
+    next_cursor: Optional[str] = Field(description='Opaque cursor pointing to the next page of the list.')
 
     @classmethod
     def create_list(
@@ -22,7 +81,8 @@ class PaginatedList(GenericModel, Generic[DataT]):
             items: List[DataT],
             current_page: int,
             total_items: int,
-            items_per_page: int = ITEMS_PER_PAGE_DEFAULT
+            items_per_page: int = ITEMS_PER_PAGE_DEFAULT,
+            next_cursor: Optional[str] = None,
     ):
         last_page = (total_items // items_per_page) + 1
         next_page = current_page + 1 if current_page < last_page else None
@@ -36,4 +96,43 @@ class PaginatedList(GenericModel, Generic[DataT]):
             next_page=next_page,
             last_page=last_page,
             total_items=total_items,
+            next_cursor=next_cursor,
+        )
+
+    @classmethod
+    def create_cursor_list(
+            cls,
+            items: List[DataT],
+            next_cursor: Optional[str],
+            items_per_page: int = ITEMS_PER_PAGE_DEFAULT,
+    ):
+        return cls(
+            items=items,
+            items_per_page=items_per_page,
+            next_cursor=next_cursor,
         )
+
+
+class BatchRequest(BaseModel):
+    ids: List[UUID] = Field(
+        description=f'The IDs to look up, at most {BATCH_MAX_ITEMS}.',
+        min_items=1,
+        max_items=BATCH_MAX_ITEMS,
+    )
+
+
+class BatchItem(GenericModel, Generic[DataT]):
+    id: UUID = Field(description='The requested ID.')
+    found: bool = Field(description='Whether an item with this ID was found.')
+    item: Optional[DataT] = Field(description='The item, when it was found.')
+
+
+class BatchList(GenericModel, Generic[DataT]):
+    items: List[BatchItem[DataT]] = Field(description='One entry per requested ID, in request order.')
+
+    @classmethod
+    def create_list(cls, ids: List[UUID], found: Dict[UUID, DataT]):
+        return cls.construct(items=[
+            BatchItem[DataT].construct(id=item_id, found=item_id in found, item=found.get(item_id))
+            for item_id in ids
+        ])
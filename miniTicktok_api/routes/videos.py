@@ -1,20 +1,20 @@
-from typing import List
-from uuid import uuid4
-from mega import Mega
-import os
+from datetime import timezone
+from email.utils import formatdate
+from typing import List, Optional
+from uuid import UUID
 
-from fastapi import APIRouter, Depends, File, Form, UploadFile
+from fastapi import APIRouter, Depends, File, Form, Header, HTTPException, Response, UploadFile
+from starlette import status
 
 from miniTicktok_api.auth import get_current_user
-from miniTicktok_api.external.mongodb import MongodbDatabase
+from miniTicktok_api.config import config
+from miniTicktok_api.external.mongodb import AsyncMongodbDatabase
 from miniTicktok_api.models.users import User
-from miniTicktok_api.models.videos import VideoRecording
+from miniTicktok_api.models.videos import VideoRecording, VideoUploadJob
+from miniTicktok_api.responses import RangeFileResponse
 from miniTicktok_api.services import services
-
-from dotenv import load_dotenv
-
-# Load environment variables from .env file
-load_dotenv()
+from miniTicktok_api.uploads import VideoUploadQueue, release_video_recording, spool_upload
+from miniTicktok_api.video_cache import VideoDiskCache
 
 # =================== Router ==================== #
 
@@ -41,39 +41,97 @@ class CreateVideoRequest:
 
 @router.post(
     path='',
-    description='Upload and create video recording that can be attached to feed posts.',
-
+    description='Upload a video recording that can be attached to feed posts. '
+                'The upload to storage happens in the background, poll the returned job for its `video_uri`.',
+    status_code=status.HTTP_202_ACCEPTED,
+    response_model=VideoUploadJob,
 )
 async def create_voice(
         request: CreateVideoRequest = Depends(CreateVideoRequest),
         user: User = Depends(get_current_user),
+) -> VideoUploadJob:
+    upload = await spool_upload(request.file)
+    job = VideoUploadJob(user_id=user.id)
+
+    try:
+        await services.get(VideoUploadQueue).enqueue(job, upload)
+    except BaseException:
+        upload.remove()
+        raise
+
+    return job
+
+
+@router.get(
+    path='/jobs/{job_id}',
+    description='Get the status of a video upload job.',
+    response_model=VideoUploadJob,
+)
+async def get_upload_job(job_id: UUID, user: User = Depends(get_current_user)) -> VideoUploadJob:
+    jobs_collection = services.get(AsyncMongodbDatabase).database.get_collection('video_upload_jobs')
+    job_data = await jobs_collection.find_one({"id": job_id, "user_id": user.id})
+
+    if not job_data:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload job not found.")
+
+    return VideoUploadJob.parse_obj(job_data)
+
+
+@router.get(
+    path='/{video_recording_id}/content',
+    description='Stream the content of a video recording. Supports `Range` requests for seeking.',
+    response_class=RangeFileResponse,
+    status_code=status.HTTP_200_OK,
+    responses={206: {'description': 'The requested byte range of the video.'}},
+)
+async def get_video_recording_content(
+        video_recording_id: UUID,
+        range_header: Optional[str] = Header(None, alias='Range'),
+        if_range: Optional[str] = Header(None),
+        if_none_match: Optional[str] = Header(None),
 ):
-    voice_recordings_collection = services.get(MongodbDatabase).database.get_collection('video_recordings')
+    video_recordings_collection = services.get(AsyncMongodbDatabase).database.get_collection('video_recordings')
+    video_recording_data = await video_recordings_collection.find_one({"id": video_recording_id})
+
+    if not video_recording_data:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Video recording not found.")
 
-    voice_id = uuid4()
-    file_name = f'video-rec-{str(voice_id)}.mp4'
+    video_recording = VideoRecording.parse_obj(video_recording_data)
 
-    file_path = f"./{request.file.filename}"
+    if not video_recording.storage_key:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Video content not available.")
 
-    mega = Mega()
-    m = mega.login(os.getenv("APP_MEGA_EMAIL"), os.getenv("APP_MEGA_PASSWORD"))
+    etag = f'"{video_recording.content_sha256 or video_recording.id}"'
+    headers = {
+        'etag': etag,
+        'cache-control': f'private, max-age={config.video_cache_max_age_seconds}',
+        'last-modified': formatdate(video_recording.created_at.replace(tzinfo=timezone.utc).timestamp(), usegmt=True),
+    }
 
-    with open(file_path, "wb") as f:
-        f.write(await request.file.read())
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(',')]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
 
-    m.upload(file_path, dest_filename=file_name)
+    if if_range and if_range != etag:
+        range_header = None
 
-    file = m.find(file_name)
-    video_uri = m.get_link(file)
+    file = await services.get(VideoDiskCache).open(video_recording.storage_key)
+
+    return RangeFileResponse(file, range_header=range_header, headers=headers, media_type='video/mp4')
+
+
+@router.delete(
+    path='/{video_recording_id}',
+    description='Delete a video recording uploaded by the authenticated user.',
+    status_code=status.HTTP_204_NO_CONTENT,
+)
+async def delete_video_recording(video_recording_id: UUID, user: User = Depends(get_current_user)):
+    video_recordings_collection = services.get(AsyncMongodbDatabase).database.get_collection('video_recordings')
+    video_recording_data = await video_recordings_collection.find_one_and_delete(
+        {"id": video_recording_id, "uploaded_by_user_id": user.id})
 
-    voice_recording = VideoRecording(
-        id=voice_id,
-        uploaded_by_user_id=user.id,
-        video_uri=video_uri,
-    )
+    if not video_recording_data:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Video recording not found.")
 
-    if os.path.exists(file_path):
-        os.remove(file_path)
+    await release_video_recording(VideoRecording.parse_obj(video_recording_data))
 
-    voice_recordings_collection.insert_one(voice_recording.dict())
-    return video_uri
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
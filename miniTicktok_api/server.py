@@ -0,0 +1,66 @@
+"""
+The production server: gunicorn running one uvicorn worker per CPU core.
+
+    python -m miniTicktok_api.server [--bind 0.0.0.0:8000] [--workers 4]
+
+The app is imported once in the master process and the workers are forked from it, so they start fast and
+share its memory. Each worker creates its own database clients and thread pools after the fork, see `Services`.
+Metrics of all workers are collected in a temporary `PROMETHEUS_MULTIPROC_DIR`, unless one is set already.
+The in-process pool and cache statistics (`app_*`) are not aggregated across workers.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+from typing import List
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m miniTicktok_api.server')
+    parser.add_argument('--bind', help='Address to listen on, overrides APP_SERVER_BIND.')
+    parser.add_argument('--workers', type=int, help='Number of workers, overrides APP_SERVER_WORKERS.')
+    args = parser.parse_args(argv)
+
+    # prometheus_client picks its storage when first imported, so this must happen before the app is loaded.
+    multiproc_dir = None
+
+    if not os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        multiproc_dir = os.environ['PROMETHEUS_MULTIPROC_DIR'] = tempfile.mkdtemp(prefix='miniTicktok-metrics-')
+
+    from gunicorn.app.base import BaseApplication
+    from prometheus_client import multiprocess
+
+    from miniTicktok_api.config import config
+
+    class Server(BaseApplication):
+        def load_config(self):
+            options = {
+                'bind': args.bind or config.server_bind,
+                'workers': args.workers or config.server_workers or os.cpu_count() or 1,
+                'worker_class': 'uvicorn.workers.UvicornWorker',
+                'preload_app': True,
+                'timeout': config.server_timeout_seconds,
+                'graceful_timeout': config.server_graceful_timeout_seconds,
+                'keepalive': config.server_keepalive_seconds,
+                'child_exit': lambda server, worker: multiprocess.mark_process_dead(worker.pid),
+            }
+
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from miniTicktok_api.app import app
+            return app
+
+    try:
+        Server().run()
+    finally:
+        if multiproc_dir:
+            shutil.rmtree(multiproc_dir, ignore_errors=True)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
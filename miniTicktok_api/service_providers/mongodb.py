@@ -1,11 +1,87 @@
+import asyncio
+from typing import Dict
+
+from pymongo.errors import PyMongoError
+from starlette.concurrency import run_in_threadpool
+
 from miniTicktok_api.config import config
 from miniTicktok_api.service_providers.service_prodiver import ServiceProvider
 
 
+def _event_listeners() -> list:
+    from miniTicktok_api.metrics import mongodb_event_listeners
+    from miniTicktok_api.slow_queries import slow_query_listener
+
+    return [*mongodb_event_listeners(), slow_query_listener]
+
+
 class MongodbDatabaseServiceProvider(ServiceProvider):
     def register(self):
         def create_instance():
             from miniTicktok_api.external.mongodb import MongodbDatabase
-            return MongodbDatabase(uri=config.db_uri, database=config.db_default_database)
+
+            return MongodbDatabase(
+                uri=config.db_uri,
+                database=config.db_default_database,
+                event_listeners=_event_listeners(),
+            )
+
+        def create_async_instance():
+            from miniTicktok_api.external.mongodb import AsyncMongodbDatabase
+
+            return AsyncMongodbDatabase(
+                uri=config.db_uri,
+                database=config.db_default_database,
+                event_listeners=_event_listeners(),
+                min_pool_size=config.db_min_pool_size,
+            )
 
         self.app.singleton('MongodbDatabase', create_instance)
+        self.app.singleton('AsyncMongodbDatabase', create_async_instance)
+
+    async def startup(self):
+        from miniTicktok_api.external.mongodb import AsyncMongodbDatabase
+
+        if config.db_apply_indexes_on_boot:
+            await self._apply_indexes()
+
+        database = self.app.get(AsyncMongodbDatabase)
+
+        # Concurrent pings check out as many connections, so the pool is full before the first request.
+        try:
+            await asyncio.gather(*(
+                database.client.admin.command('ping') for _ in range(max(1, database.min_pool_size))
+            ))
+        except PyMongoError as e:
+            self.app.logger.error(f'Failed to warm up the database connection pool: {e}')
+
+    async def _apply_indexes(self):
+        '''on startup rather than at import, so importing the app never waits on an unreachable server'''
+
+        from miniTicktok_api.external.mongodb import MongodbDatabase
+        from miniTicktok_api.indexes import apply_indexes
+
+        try:
+            await run_in_threadpool(apply_indexes, self.app.get(MongodbDatabase).database)
+        except PyMongoError as e:
+            self.app.logger.error(f'Failed to apply database indexes: {e}')
+
+    async def shutdown(self, deadline: float):
+        from miniTicktok_api.external.mongodb import AsyncMongodbDatabase, MongodbDatabase
+
+        for database in (self.app.created(AsyncMongodbDatabase), self.app.created(MongodbDatabase)):
+            if database is not None:
+                database.client.close()
+
+    async def health(self) -> Dict[str, bool]:
+        from miniTicktok_api.external.mongodb import AsyncMongodbDatabase
+
+        try:
+            await asyncio.wait_for(
+                self.app.get(AsyncMongodbDatabase).client.admin.command('ping'),
+                timeout=config.db_health_timeout_seconds,
+            )
+        except (PyMongoError, asyncio.TimeoutError):
+            return {'mongodb': False}
+
+        return {'mongodb': True}
@@ -1,3 +1,5 @@
+from typing import Dict
+
 
 class ServiceProvider:
     def __init__(self, app):
@@ -8,3 +10,17 @@ class ServiceProvider:
 
     def boot(self):
         pass
+
+    async def startup(self):
+        """Prepare the services of this provider before the worker takes requests, e.g. open connections."""
+
+    async def shutdown(self, deadline: float):
+        """
+        Release the services of this provider once the worker stopped taking requests. Waiting on pending work
+        stops at `deadline`, a `time.monotonic()` value shared by the whole shutdown.
+        """
+
+    async def health(self) -> Dict[str, bool]:
+        """Whether the services of this provider are usable, by name."""
+
+        return {}
@@ -0,0 +1,72 @@
+import time
+
+from miniTicktok_api.config import config
+from miniTicktok_api.service_providers.service_prodiver import ServiceProvider
+
+
+class StorageServiceProvider(ServiceProvider):
+    def register(self):
+        def create_instance():
+            from miniTicktok_api.external import storage
+
+            if config.storage_backend == 'local':
+                return storage.LocalStorageBackend(
+                    root=config.storage_local_root,
+                    base_url=config.storage_local_base_url or f'{config.app_url}/media',
+                )
+
+            if config.storage_backend == 'b2':
+                return storage.B2StorageBackend(
+                    key_id=config.b2_key_id,
+                    application_key=config.b2_application_key,
+                    bucket_name=config.b2_bucket_name,
+                    pool_size=config.storage_pool_size,
+                    session_max_age=config.storage_session_max_age_seconds,
+                )
+
+            return storage.MegaStorageBackend(
+                email=config.mega_email,
+                password=config.mega_password,
+                pool_size=config.storage_pool_size,
+                session_max_age=config.storage_session_max_age_seconds,
+            )
+
+        def create_upload_queue():
+            from miniTicktok_api.uploads import VideoUploadQueue
+
+            return VideoUploadQueue(
+                workers=config.video_upload_workers,
+                max_size=config.video_upload_queue_size,
+                max_attempts=config.video_upload_max_attempts,
+                retry_backoff=config.video_upload_retry_backoff_seconds,
+            )
+
+        def create_video_cache():
+            from miniTicktok_api.metrics import stats_collector
+            from miniTicktok_api.video_cache import VideoDiskCache
+
+            video_cache = VideoDiskCache(directory=config.video_cache_dir, max_bytes=config.video_cache_max_bytes)
+            stats_collector.register('video_cache', video_cache.stats)
+
+            return video_cache
+
+        self.app.singleton('StorageBackend', create_instance)
+        self.app.singleton('VideoDiskCache', create_video_cache)
+        self.app.singleton('VideoUploadQueue', create_upload_queue)
+
+    async def startup(self):
+        from miniTicktok_api.external.storage import StorageBackend
+        from miniTicktok_api.uploads import VideoUploadQueue
+        from miniTicktok_api.video_cache import VideoDiskCache
+
+        self.app.get(StorageBackend)
+        self.app.get(VideoDiskCache).load()
+        self.app.get(VideoUploadQueue).start()
+
+    async def shutdown(self, deadline: float):
+        from miniTicktok_api.uploads import VideoUploadQueue
+
+        upload_queue = self.app.created(VideoUploadQueue)
+
+        if upload_queue is not None:
+            await upload_queue.close(timeout=max(0.0, deadline - time.monotonic()))
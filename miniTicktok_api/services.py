@@ -1,6 +1,8 @@
+import asyncio
 import logging
+import os
 from importlib import import_module
-from typing import List, TypeVar, Dict, Callable
+from typing import Any, List, Optional, TypeVar, Dict, Callable
 from miniTicktok_api.service_providers.service_prodiver import ServiceProvider
 
 T = TypeVar('T')
@@ -13,18 +15,35 @@ class ServiceNotFoundException(Exception):
 
 
 class Services:
+    """
+    The service container.
+
+    Instances are created on first use and belong to the process that created them: a forked child, such as a
+    worker of a preloading server, starts without any and creates its own, so clients are never shared.
+
+    `startup()`, `shutdown()` and `health()` run the matching hooks of every service provider, see `lifecycle`.
+    """
+
     logger = logging.getLogger('app_logger')
 
     services: List[str] = [
         'miniTicktok_api.service_providers.mongodb.MongodbDatabaseServiceProvider',
+        'miniTicktok_api.service_providers.storage.StorageServiceProvider',
     ]
 
-    singletons: Dict[str, Callable] = {}
+    singletons: Dict[str, Callable]
+
+    instances: Dict[str, Any]
 
-    instances: Dict[str, ServiceProvider] = {}
+    providers: List[ServiceProvider]
 
     def __init__(self):
-        service_providers: List[ServiceProvider] = []
+        self.singletons = {}
+        self.instances = {}
+        self.providers = []
+
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self.reset)
 
         for service_provider_path in self.services:
             module = service_provider_path.rpartition('.')[0]
@@ -32,11 +51,40 @@ class Services:
             service_provider_class = getattr(import_module(module), class_name)
             service_provider_instance: ServiceProvider = service_provider_class(self)
             service_provider_instance.register()
-            service_providers.append(service_provider_instance)
+            self.providers.append(service_provider_instance)
 
-        for service_provider_instance in service_providers:
+        for service_provider_instance in self.providers:
             service_provider_instance.boot()
 
+    def reset(self):
+        """Forget the created instances, they are created again on next use."""
+
+        self.instances = {}
+
+    async def startup(self):
+        for service_provider in self.providers:
+            await service_provider.startup()
+
+    async def shutdown(self, deadline: float):
+        for service_provider in reversed(self.providers):
+            try:
+                await service_provider.shutdown(deadline)
+            except Exception:
+                self.logger.exception(f'Failed to shut down {type(service_provider).__name__}.')
+
+    async def health(self) -> Dict[str, bool]:
+        checks: Dict[str, bool] = {}
+
+        for provider_checks in await asyncio.gather(*(provider.health() for provider in self.providers)):
+            checks.update(provider_checks)
+
+        return checks
+
+    def created(self, name: T) -> Optional[T]:
+        """The instance of a service if it was created already, without creating it."""
+
+        return self.instances.get(name.__name__)
+
     def singleton(self, name: str, factory: Callable):
         self.singletons[name] = factory
 
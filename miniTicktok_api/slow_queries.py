@@ -0,0 +1,317 @@
+"""
+Detection of slow MongoDB commands.
+
+`SlowQueryListener` watches the commands of the Mongo clients and records every one slower than
+`slow_query_threshold_ms` in `slow_query_report`, aggregated by collection, command, filter shape and route.
+A sample of them is explained on a background thread, which adds the winning plan and the number of
+documents examined versus returned to the report. Collection scans then stand out as `collscan` entries.
+"""
+import json
+import logging
+import os
+import random
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+from pymongo import monitoring
+from pymongo.errors import PyMongoError
+
+from miniTicktok_api.config import config
+from miniTicktok_api.external.mongodb import MongodbDatabase
+from miniTicktok_api.metrics import current_route
+from miniTicktok_api.services import services
+
+TRACKED_COMMANDS = {'find', 'getMore', 'aggregate', 'count', 'distinct', 'findAndModify', 'update', 'delete', 'insert'}
+
+EXPLAINABLE_COMMANDS = {'find', 'aggregate', 'count', 'distinct', 'findAndModify', 'update', 'delete'}
+
+# Session and transport fields that pymongo adds to commands but `explain` does not accept.
+_NON_EXPLAINABLE_FIELDS = {'lsid', 'txnNumber', 'startTransaction', 'autocommit', 'readConcern', 'writeConcern'}
+
+_MAX_PENDING_EXPLAINS = 4
+
+
+class SlowQuery(BaseModel):
+    collection: str
+    command: str
+    shape: str
+    sort: Optional[str] = None
+    route: str
+    count: int = 0
+    failures: int = 0
+    total_ms: float = 0
+    mean_ms: float = 0
+    max_ms: float = 0
+    last_ms: float = 0
+    first_seen: datetime
+    last_seen: datetime
+    plan: Optional[str] = None
+    collscan: Optional[bool] = None
+    docs_examined: Optional[int] = None
+    keys_examined: Optional[int] = None
+    returned: Optional[int] = None
+    explained_at: Optional[datetime] = None
+
+
+def query_shape(value: Any) -> Any:
+    """Replace the values of a filter with `?`, keeping its field names and operators."""
+
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+
+    if isinstance(value, (list, tuple)) and value and all(isinstance(item, dict) for item in value):
+        return [query_shape(item) for item in value]
+
+    return '?'
+
+
+def _command_filter(command_name: str, command: dict) -> Optional[dict]:
+    if command_name == 'find':
+        return command.get('filter')
+
+    if command_name in ('count', 'distinct', 'findAndModify'):
+        return command.get('query')
+
+    if command_name in ('update', 'delete'):
+        statements = command.get(f'{command_name}s') or [{}]
+        return statements[0].get('q')
+
+    if command_name == 'aggregate':
+        for stage in command.get('pipeline', ()):
+            if '$match' in stage:
+                return stage['$match']
+
+    return None
+
+
+def _dump(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, separators=(',', ':'), default=str)
+
+
+def _summarise_plan(stage: dict) -> str:
+    '''the stages of a plan from the outermost one, like "LIMIT > FETCH > IXSCAN posts_feed"'''
+
+    stages = []
+
+    while stage:
+        name = stage.get('stage', '?')
+
+        if stage.get('indexName'):
+            name = f"{name} {stage['indexName']}"
+
+        stages.append(name)
+        stage = stage.get('inputStage') or next(iter(stage.get('inputStages') or ()), None)
+
+    return ' > '.join(stages)
+
+
+def _plan_details(explain: dict) -> Dict[str, Any]:
+    '''the winning plan and execution stats of an explain result, also for aggregations'''
+
+    planner = explain.get('queryPlanner')
+    stats = explain.get('executionStats') or {}
+
+    if planner is None and explain.get('stages'):
+        cursor_stage = explain['stages'][0].get('$cursor', {})
+        planner = cursor_stage.get('queryPlanner')
+        stats = cursor_stage.get('executionStats') or {}
+
+    winning_plan = (planner or {}).get('winningPlan', {})
+    plan = _summarise_plan(winning_plan.get('queryPlan', winning_plan))
+
+    return {
+        'plan': plan,
+        'collscan': 'COLLSCAN' in plan,
+        'docs_examined': stats.get('totalDocsExamined'),
+        'keys_examined': stats.get('totalKeysExamined'),
+        'returned': stats.get('nReturned'),
+    }
+
+
+class SlowQueryReport:
+    """Slow commands aggregated per collection, command, filter shape, sort and route, in LRU order."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Tuple[str, ...], SlowQuery]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, key: Tuple[str, ...], duration_ms: float, failed: bool = False):
+        now = datetime.utcnow()
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                collection, command, shape, sort, route = key
+                entry = self._entries[key] = SlowQuery(
+                    collection=collection,
+                    command=command,
+                    shape=shape,
+                    sort=sort or None,
+                    route=route,
+                    first_seen=now,
+                    last_seen=now,
+                )
+
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            else:
+                self._entries.move_to_end(key)
+
+            entry.count += 1
+            entry.failures += int(failed)
+            entry.total_ms += duration_ms
+            entry.mean_ms = entry.total_ms / entry.count
+            entry.max_ms = max(entry.max_ms, duration_ms)
+            entry.last_ms = duration_ms
+            entry.last_seen = now
+
+    def claim_explain(self, key: Tuple[str, ...], interval: float) -> bool:
+        '''whether the entry is due for an explain, marking it as explained if so'''
+
+        now = datetime.utcnow()
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None or (entry.explained_at and (now - entry.explained_at).total_seconds() < interval):
+                return False
+
+            entry.explained_at = now
+            return True
+
+    def attach_plan(self, key: Tuple[str, ...], explain: dict):
+        details = _plan_details(explain)
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is not None:
+                for name, value in details.items():
+                    setattr(entry, name, value)
+
+    def query(
+            self,
+            collection: Optional[str] = None,
+            route: Optional[str] = None,
+            collscan: Optional[bool] = None,
+            sort_by: str = 'total_ms',
+            limit: int = 50,
+    ) -> List[SlowQuery]:
+        with self._lock:
+            entries = [entry.copy() for entry in self._entries.values()]
+
+        entries = [
+            entry for entry in entries
+            if (collection is None or entry.collection == collection)
+            and (route is None or entry.route == route)
+            and (collscan is None or entry.collscan == collscan)
+        ]
+
+        return sorted(entries, key=lambda entry: getattr(entry, sort_by), reverse=True)[:limit]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SlowQueryListener(monitoring.CommandListener):
+    """Feeds commands slower than `threshold_ms` into a `SlowQueryReport` and explains a sample of them."""
+
+    logger = logging.getLogger('app_logger')
+
+    def __init__(self, report: SlowQueryReport, threshold_ms: float, explain_sample_rate: float,
+                 explain_interval: float):
+        self.report = report
+        self.threshold_ms = threshold_ms
+        self.explain_sample_rate = explain_sample_rate
+        self.explain_interval = explain_interval
+        self._commands: Dict[int, Tuple[str, dict, str]] = {}
+        self._pending_explains = 0
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def reset(self):
+        self._commands = {}
+        self._pending_explains = 0
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        if event.command_name in TRACKED_COMMANDS:
+            self._commands[event.request_id] = (event.database_name, event.command, current_route.get())
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        self._finished(event, failed=False)
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        self._finished(event, failed=True)
+
+    def _finished(self, event, failed: bool):
+        started = self._commands.pop(event.request_id, None)
+        duration_ms = event.duration_micros / 1000
+
+        if started is None or duration_ms < self.threshold_ms:
+            return
+
+        database_name, command, route = started
+        command_name = event.command_name
+        collection = command.get('collection') if command_name == 'getMore' else command.get(command_name)
+
+        key = (
+            collection if isinstance(collection, str) else '',
+            command_name,
+            _dump(query_shape(_command_filter(command_name, command) or {})),
+            _dump(command['sort']) if command.get('sort') else '',
+            route,
+        )
+        self.report.record(key, duration_ms, failed)
+
+        if failed or command_name not in EXPLAINABLE_COMMANDS or random.random() >= self.explain_sample_rate:
+            return
+
+        # Commands finish on the executor threads of motor, the explains on their own thread.
+        with self._lock:
+            if self._pending_explains >= _MAX_PENDING_EXPLAINS or not self.report.claim_explain(
+                    key, self.explain_interval):
+                return
+
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='slow-query-explain')
+
+            self._pending_explains += 1
+            self._executor.submit(self._explain, key, database_name, command)
+
+    def _explain(self, key: Tuple[str, ...], database_name: str, command: dict):
+        explain_command = {
+            name: value for name, value in command.items()
+            if not name.startswith('$') and name not in _NON_EXPLAINABLE_FIELDS
+        }
+
+        try:
+            explain = services.get(MongodbDatabase).client.get_database(database_name).command(
+                {'explain': explain_command, 'verbosity': 'executionStats'})
+            self.report.attach_plan(key, explain)
+        except PyMongoError as e:
+            self.logger.warning(f'Failed to explain slow {key[1]} on {key[0]}: {e}')
+        finally:
+            with self._lock:
+                self._pending_explains -= 1
+
+
+slow_query_report = SlowQueryReport(max_entries=config.slow_query_report_max_entries)
+
+slow_query_listener = SlowQueryListener(
+    report=slow_query_report,
+    threshold_ms=config.slow_query_threshold_ms,
+    explain_sample_rate=config.slow_query_explain_sample_rate,
+    explain_interval=config.slow_query_explain_interval_seconds,
+)
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=slow_query_listener.reset)
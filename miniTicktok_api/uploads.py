@@ -0,0 +1,360 @@
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import HTTPException, UploadFile
+from pymongo import ReturnDocument
+from starlette import status
+from starlette.concurrency import run_in_threadpool
+
+from miniTicktok_api.config import config
+from miniTicktok_api.external.mongodb import AsyncMongodbDatabase
+from miniTicktok_api.external.storage import StorageBackend
+from miniTicktok_api.metrics import VIDEO_UPLOAD_DURATION, current_route
+from miniTicktok_api.models.videos import StoredVideo, VideoRecording, VideoUploadJob, VideoUploadStatus
+from miniTicktok_api.services import services
+
+
+class SpooledUpload:
+    """An uploaded file written to a unique spool file on local disk."""
+
+    def __init__(self, path: str, size: int, sha256: str, filename: Optional[str] = None):
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+        self.filename = filename
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def _too_large() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Upload exceeds the maximum size of {config.upload_max_bytes} bytes.",
+    )
+
+
+async def spool_upload(file: UploadFile) -> SpooledUpload:
+    """
+    Stream an upload to a unique temp file in fixed-size chunks.
+
+    Memory stays bounded by `upload_chunk_size` whatever the file size. The SHA-256 of the content is
+    computed on the way, and uploads larger than `upload_max_bytes` are rejected with a 413.
+    """
+
+    spool_dir = config.upload_spool_dir or tempfile.gettempdir()
+    os.makedirs(spool_dir, exist_ok=True)
+
+    suffix = os.path.splitext(file.filename or '')[1][:16]
+    fd, path = tempfile.mkstemp(prefix='upload-', suffix=suffix, dir=spool_dir)
+    digest = hashlib.sha256()
+    size = 0
+
+    try:
+        with os.fdopen(fd, 'wb') as spool:
+            while True:
+                chunk = await file.read(config.upload_chunk_size)
+
+                if not chunk:
+                    break
+
+                size += len(chunk)
+
+                if size > config.upload_max_bytes:
+                    raise _too_large()
+
+                digest.update(chunk)
+                await run_in_threadpool(spool.write, chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+
+    return SpooledUpload(path=path, size=size, sha256=digest.hexdigest(), filename=file.filename)
+
+
+class VideoUploadQueue:
+    """
+    A bounded queue of spooled uploads, drained by a fixed pool of worker tasks.
+
+    Each job uploads its file to the storage backend, retrying with exponential backoff, and then writes
+    the final `VideoRecording`. Job progress is persisted in the `video_upload_jobs` collection. A job that
+    fails after its file got stored is rolled back and marked as failed.
+
+    Stored files are content addressed: uploads whose SHA-256 matches an already stored video reuse it
+    without touching the storage backend, and `video_objects` keeps a reference count per stored file.
+    """
+
+    logger = logging.getLogger('app_logger')
+
+    def __init__(self, workers: int, max_size: int, max_attempts: int, retry_backoff: float):
+        self.workers = workers
+        self.max_size = max_size
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._reserved = 0
+
+    def start(self):
+        """Start the workers, unless they are running. Happens on the first upload unless called before."""
+
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_size)
+
+        self._tasks = [task for task in self._tasks if not task.done()]
+
+        while len(self._tasks) < self.workers:
+            self._tasks.append(asyncio.get_running_loop().create_task(self._work()))
+
+    @staticmethod
+    def _jobs_collection():
+        return services.get(AsyncMongodbDatabase).database.get_collection('video_upload_jobs')
+
+    async def enqueue(self, job: VideoUploadJob, upload: SpooledUpload):
+        stored_video = await _acquire_stored_video(upload.sha256)
+
+        if stored_video:
+            upload.remove()
+            await _insert_video_recording(job, stored_video)
+
+            job.status = VideoUploadStatus.COMPLETED
+            job.video_uri = stored_video.video_uri
+            await self._jobs_collection().insert_one(job.dict())
+
+            return
+
+        self.start()
+
+        # The slot is reserved before the job is stored, so concurrent uploads cannot fill the queue meanwhile.
+        if self._queue.qsize() + self._reserved >= self.max_size:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many uploads in progress, please retry shortly.",
+                headers={"Retry-After": str(config.video_upload_retry_after_seconds)},
+            )
+
+        self._reserved += 1
+
+        try:
+            await self._jobs_collection().insert_one(job.dict())
+        finally:
+            self._reserved -= 1
+
+        self._queue.put_nowait((job, upload))
+
+    async def close(self, timeout: float):
+        """Wait up to `timeout` seconds for the queued uploads to finish, then stop the workers."""
+
+        if self._queue is not None and self._tasks:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout=timeout)
+            except asyncio.TimeoutError:
+                self.logger.warning(f'Stopping with {self._queue.qsize()} video uploads still queued.')
+
+        for task in self._tasks:
+            task.cancel()
+
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _work(self):
+        # The task inherited the context of the request that started it, its queries belong to the queue.
+        current_route.set('<video upload queue>')
+
+        while True:
+            job, upload = await self._queue.get()
+
+            try:
+                await self._process(job, upload)
+            except Exception:
+                self.logger.exception(f'Video upload job {job.id} crashed.')
+            finally:
+                upload.remove()
+                self._queue.task_done()
+
+    async def _update_job(self, job: VideoUploadJob, **changes):
+        for key, value in changes.items():
+            setattr(job, key, value)
+
+        job.updated_at = datetime.utcnow()
+
+        await self._jobs_collection().update_one(
+            {'id': job.id},
+            {'$set': {**changes, 'updated_at': job.updated_at}},
+        )
+
+    async def _process(self, job: VideoUploadJob, upload: SpooledUpload):
+        storage_key = f'video-rec-{job.video_recording_id}.mp4'
+        storage = services.get(StorageBackend)
+
+        await self._update_job(job, status=VideoUploadStatus.UPLOADING)
+
+        while True:
+            started_at = time.perf_counter()
+
+            try:
+                video_uri = await run_in_threadpool(storage.upload, upload.path, storage_key)
+                VIDEO_UPLOAD_DURATION.labels('success').observe(time.perf_counter() - started_at)
+                break
+            except Exception as e:
+                VIDEO_UPLOAD_DURATION.labels('failure').observe(time.perf_counter() - started_at)
+                await self._update_job(job, attempts=job.attempts + 1, error=str(e))
+
+                if job.attempts >= self.max_attempts:
+                    await self._update_job(job, status=VideoUploadStatus.FAILED)
+                    return
+
+                await asyncio.sleep(self.retry_backoff * 2 ** (job.attempts - 1))
+
+        attempts = job.attempts + 1
+        stored_video = None
+
+        try:
+            stored_video = await _register_stored_video(StoredVideo(
+                content_sha256=upload.sha256,
+                storage_key=storage_key,
+                video_uri=video_uri,
+            ))
+
+            if stored_video.storage_key != storage_key:
+                await run_in_threadpool(storage.delete, storage_key)
+
+            await _insert_video_recording(job, stored_video)
+
+            await self._update_job(
+                job,
+                status=VideoUploadStatus.COMPLETED,
+                attempts=attempts,
+                video_uri=stored_video.video_uri,
+            )
+        except Exception as e:
+            self.logger.exception(f'Video upload job {job.id} failed after storing its file.')
+
+            await self._roll_back(job, upload.sha256, storage_key, stored_video)
+            await self._update_job(job, status=VideoUploadStatus.FAILED, attempts=attempts, video_uri=None,
+                                   error=str(e))
+
+    async def _roll_back(
+            self,
+            job: VideoUploadJob,
+            content_sha256: str,
+            storage_key: str,
+            stored_video: Optional[StoredVideo],
+    ):
+        """
+        Undo what a job wrote after uploading its file.
+
+        The recording is removed and the reference on the stored video released, so the file goes away with
+        it unless other recordings share it. Without a registered stored video the uploaded file is deleted.
+        """
+
+        try:
+            await _video_recordings_collection().delete_one({'id': job.video_recording_id})
+
+            if stored_video is None:
+                # The registration may still have been applied. The key belongs to this job alone, so a stored
+                # video with it holds the reference this job took.
+                stored_video_data = await _video_objects_collection().find_one(
+                    {'content_sha256': content_sha256, 'storage_key': storage_key},
+                )
+
+                if not stored_video_data:
+                    await run_in_threadpool(services.get(StorageBackend).delete, storage_key)
+                    return
+
+            await _release_stored_video(content_sha256)
+        except Exception:
+            self.logger.exception(f'Failed to roll back video upload job {job.id}.')
+
+
+def _video_objects_collection():
+    return services.get(AsyncMongodbDatabase).database.get_collection('video_objects')
+
+
+def _video_recordings_collection():
+    return services.get(AsyncMongodbDatabase).database.get_collection('video_recordings')
+
+
+async def _acquire_stored_video(content_sha256: str) -> Optional[StoredVideo]:
+    """Take a reference on an already stored video with the same content, if there is one."""
+
+    stored_video_data = await _video_objects_collection().find_one_and_update(
+        {'content_sha256': content_sha256, 'ref_count': {'$gt': 0}},
+        {'$inc': {'ref_count': 1}},
+        return_document=ReturnDocument.AFTER,
+    )
+
+    return StoredVideo.parse_obj(stored_video_data) if stored_video_data else None
+
+
+async def _register_stored_video(stored_video: StoredVideo) -> StoredVideo:
+    """
+    Take a reference on a freshly uploaded video.
+
+    If the same content got stored concurrently, the existing object wins and is returned instead.
+    """
+
+    stored_video_data = await _video_objects_collection().find_one_and_update(
+        {'content_sha256': stored_video.content_sha256},
+        {
+            '$inc': {'ref_count': 1},
+            '$setOnInsert': stored_video.dict(exclude={'ref_count'}),
+        },
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+
+    return StoredVideo.parse_obj(stored_video_data)
+
+
+async def _insert_video_recording(job: VideoUploadJob, stored_video: StoredVideo):
+    video_recording = VideoRecording(
+        id=job.video_recording_id,
+        uploaded_by_user_id=job.user_id,
+        video_uri=stored_video.video_uri,
+        storage_key=stored_video.storage_key,
+        content_sha256=stored_video.content_sha256,
+    )
+
+    await _video_recordings_collection().insert_one(video_recording.dict())
+
+
+async def release_video_recording(video_recording: VideoRecording):
+    """
+    Drop the reference a deleted video recording held on its stored file.
+
+    The file is removed from the storage backend once no recording references it anymore.
+    """
+
+    if not video_recording.content_sha256:
+        if video_recording.storage_key:
+            await run_in_threadpool(services.get(StorageBackend).delete, video_recording.storage_key)
+
+        return
+
+    await _release_stored_video(video_recording.content_sha256)
+
+
+async def _release_stored_video(content_sha256: str):
+    """Drop a reference on a stored video, removing its file from the storage backend with the last one."""
+
+    video_objects_collection = _video_objects_collection()
+
+    await video_objects_collection.update_one(
+        {'content_sha256': content_sha256},
+        {'$inc': {'ref_count': -1}},
+    )
+
+    stored_video_data = await video_objects_collection.find_one_and_delete(
+        {'content_sha256': content_sha256, 'ref_count': {'$lte': 0}},
+    )
+
+    if stored_video_data:
+        await run_in_threadpool(services.get(StorageBackend).delete, stored_video_data['storage_key'])
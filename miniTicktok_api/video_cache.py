@@ -0,0 +1,169 @@
+import asyncio
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import BinaryIO, Dict, Iterator, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from miniTicktok_api.external.storage import StorageBackend
+from miniTicktok_api.services import services
+
+try:
+    import fcntl
+except ImportError:  # Windows, where the development server runs a single process.
+    fcntl = None
+
+_LOCK_FILE = '.lock'
+
+
+class VideoDiskCache:
+    """
+    A size-bounded cache of video files on local disk.
+
+    Misses are filled from the storage backend, concurrent misses for the same key share a single download,
+    and the least recently used files are evicted once the cache grows over `max_bytes`.
+
+    The directory is shared by every worker of the server, so the cache size is that of the directory: it is
+    measured under a file lock when evicting, with recency kept in the files' modification times. A file
+    evicted while another worker sends it stays readable through that worker's open handle, see `open()`.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.files = 0
+        self.hits = 0
+        self.misses = 0
+        self._loaded = False
+        self._downloads: Dict[str, asyncio.Future] = {}
+
+    def load(self):
+        """Create the cache directory and measure it. Happens on first use unless called before."""
+
+        if self._loaded:
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._measure()
+        self._loaded = True
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def _entries(self) -> List[os.DirEntry]:
+        return [entry for entry in os.scandir(self.directory) if entry.is_file() and not entry.name.startswith('.')]
+
+    def _measure(self):
+        entries = self._entries()
+        self.size = sum(entry.stat().st_size for entry in entries)
+        self.files = len(entries)
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        """Exclusive across the processes sharing the directory."""
+
+        if fcntl is None:
+            yield
+            return
+
+        with open(os.path.join(self.directory, _LOCK_FILE), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _evict(self, keep: str):
+        with self._locked():
+            entries = sorted((entry.stat().st_mtime, entry.stat().st_size, entry.name) for entry in self._entries())
+            size = sum(entry_size for _, entry_size, _ in entries)
+            files = len(entries)
+
+            for _, entry_size, name in entries:
+                if size <= self.max_bytes:
+                    break
+
+                if name == keep:
+                    continue
+
+                try:
+                    os.remove(self._path(name))
+                except FileNotFoundError:
+                    pass
+
+                size -= entry_size
+                files -= 1
+
+        self.size, self.files = size, files
+
+    async def _fill(self, key: str):
+        fd, tmp_path = tempfile.mkstemp(prefix='.fill-', dir=self.directory)
+        os.close(fd)
+
+        try:
+            await run_in_threadpool(services.get(StorageBackend).download, key, tmp_path)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        await run_in_threadpool(self._evict, key)
+
+    def _touch(self, key: str) -> bool:
+        """Mark a cached file as recently used. False when it is not cached."""
+
+        try:
+            os.utime(self._path(key))
+        except FileNotFoundError:
+            return False
+
+        return True
+
+    async def get_path(self, key: str) -> str:
+        """Local path of the cached file for a storage key, downloading it first on a miss."""
+
+        self.load()
+
+        if self._touch(key):
+            self.hits += 1
+
+            return self._path(key)
+
+        self.misses += 1
+
+        if key not in self._downloads:
+            self._downloads[key] = asyncio.ensure_future(self._fill(key))
+            self._downloads[key].add_done_callback(lambda _: self._downloads.pop(key, None))
+
+        await asyncio.shield(self._downloads[key])
+
+        return self._path(key)
+
+    async def open(self, key: str) -> BinaryIO:
+        """
+        The cached file for a storage key, opened for reading, downloading it first on a miss.
+
+        The open handle keeps the file readable when another worker evicts it meanwhile.
+        """
+
+        try:
+            return open(await self.get_path(key), 'rb')
+        except FileNotFoundError:
+            # Evicted by another worker between the lookup and the open.
+            return open(await self.get_path(key), 'rb')
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+
+        return {
+            'size_bytes': self.size,
+            'max_bytes': self.max_bytes,
+            'files': self.files,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,37 @@
+import os
+from types import SimpleNamespace
+
+import pytest
+
+# Configuration the app needs at import time. No test talks to these services.
+os.environ.setdefault('APP_APP_URL', 'http://api.example.com')
+os.environ.setdefault('APP_DB_URI', 'localhost:1')
+os.environ.setdefault('APP_JWT_SECRET', 'test-secret')
+os.environ.setdefault('APP_DB_APPLY_INDEXES_ON_BOOT', 'false')
+os.environ.setdefault('APP_STORAGE_BACKEND', 'local')
+
+
+@pytest.fixture
+def anyio_backend():
+    """The app runs on asyncio only, motor does not support trio."""
+
+    return 'asyncio'
+
+
+@pytest.fixture
+def database(monkeypatch):
+    """An in-memory mongomock-motor database in place of MongoDB."""
+
+    import mongomock.collection
+    from mongomock_motor import AsyncMongoMockClient
+
+    from miniTicktok_api.services import services
+
+    # mongomock validates documents with the default BSON codec options, which reject native UUIDs.
+    monkeypatch.setattr(mongomock.collection, 'BSON', None)
+
+    client = AsyncMongoMockClient()
+    mongodb = SimpleNamespace(client=client, database=client.get_database('test'))
+    monkeypatch.setitem(services.instances, 'AsyncMongodbDatabase', mongodb)
+
+    return mongodb.database
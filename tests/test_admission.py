@@ -0,0 +1,69 @@
+import pytest
+from starlette.responses import PlainTextResponse
+from starlette.testclient import TestClient
+
+from miniTicktok_api.middleware import admission
+from miniTicktok_api.middleware.admission import AdmissionControlMiddleware
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(admission.time, 'monotonic', lambda: now[0])
+
+    return now
+
+
+def _middleware(rate_limit_per_second: float, rate_limit_burst: int) -> AdmissionControlMiddleware:
+    return AdmissionControlMiddleware(None, rules=[], rate_limit_per_second=rate_limit_per_second,
+                                      rate_limit_burst=rate_limit_burst)
+
+
+def test_bucket_allows_a_burst_then_rejects(clock):
+    middleware = _middleware(rate_limit_per_second=2, rate_limit_burst=3)
+
+    assert [middleware._take_token('ip:1') for _ in range(3)] == [0, 0, 0]
+    assert middleware._take_token('ip:1') == 1
+
+
+def test_bucket_refills_over_time(clock):
+    middleware = _middleware(rate_limit_per_second=2, rate_limit_burst=3)
+
+    for _ in range(3):
+        middleware._take_token('ip:1')
+
+    clock[0] += 0.5
+    assert middleware._take_token('ip:1') == 0
+    assert middleware._take_token('ip:1') == 1
+
+    clock[0] += 60
+    assert [middleware._take_token('ip:1') for _ in range(4)] == [0, 0, 0, 1]
+
+
+def test_retry_after_covers_the_missing_token(clock):
+    middleware = _middleware(rate_limit_per_second=0.25, rate_limit_burst=1)
+
+    assert middleware._take_token('ip:1') == 0
+    assert middleware._take_token('ip:1') == 4
+
+    clock[0] += 3
+    assert middleware._take_token('ip:1') == 1
+
+
+def test_buckets_are_per_client(clock):
+    middleware = _middleware(rate_limit_per_second=1, rate_limit_burst=1)
+
+    assert middleware._take_token('ip:1') == 0
+    assert middleware._take_token('ip:1') == 1
+    assert middleware._take_token('user:1') == 0
+
+
+def test_health_checks_and_metrics_are_never_limited():
+    async def app(scope, receive, send):
+        await PlainTextResponse('ok')(scope, receive, send)
+
+    client = TestClient(AdmissionControlMiddleware(app, rules=[], rate_limit_per_second=1, rate_limit_burst=1))
+
+    assert [client.get('/health/live').status_code for _ in range(5)] == [200] * 5
+    assert [client.get('/metrics').status_code for _ in range(5)] == [200] * 5
+    assert [client.get('/feed_post').status_code for _ in range(2)] == [200, 429]
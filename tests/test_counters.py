@@ -0,0 +1,27 @@
+import pytest
+
+from miniTicktok_api import counters
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_increment_leaves_a_missing_counter_missing(database):
+    await counters.increment(counters.PUBLIC_POSTS)
+
+    assert await counters.get_count(counters.PUBLIC_POSTS) is None
+
+
+async def test_increment_adjusts_a_seeded_counter(database):
+    await counters.seed(counters.PUBLIC_POSTS, 10)
+    await counters.increment(counters.PUBLIC_POSTS)
+    await counters.increment(counters.PUBLIC_POSTS, -3)
+
+    assert await counters.get_count(counters.PUBLIC_POSTS) == 8
+
+
+async def test_seed_does_not_overwrite_an_existing_counter(database):
+    await counters.seed(counters.PUBLIC_POSTS, 10)
+    await counters.increment(counters.PUBLIC_POSTS)
+    await counters.seed(counters.PUBLIC_POSTS, 3)
+
+    assert await counters.get_count(counters.PUBLIC_POSTS) == 11
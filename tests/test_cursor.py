@@ -0,0 +1,48 @@
+import base64
+import json
+from datetime import datetime
+from uuid import uuid4
+
+import pytest
+from fastapi import HTTPException
+
+from miniTicktok_api.routes.utils import decode_cursor, encode_cursor, keyset_filter
+
+
+def _raw_cursor(payload) -> str:
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+
+def test_round_trip():
+    created_at, item_id = datetime(2023, 1, 2, 3, 4, 5, 678000), uuid4()
+
+    assert decode_cursor(encode_cursor(created_at, item_id)) == (created_at, item_id)
+
+
+def test_keyset_filter_continues_after_the_cursor():
+    created_at, item_id = datetime(2023, 1, 2), uuid4()
+
+    assert keyset_filter(encode_cursor(created_at, item_id)) == {'$or': [
+        {'created_at': {'$lt': created_at}},
+        {'created_at': created_at, 'id': {'$lt': item_id}},
+    ]}
+
+
+@pytest.mark.parametrize('cursor', [
+    '',
+    'not base64!',
+    base64.urlsafe_b64encode(b'\xff\xfe').decode(),
+    _raw_cursor('just a string'),
+    _raw_cursor(['2020-01-01T00:00:00']),
+    _raw_cursor(['2020-01-01T00:00:00', str(uuid4()), 'extra']),
+    _raw_cursor(['2020-01-01T00:00:00', 2]),
+    _raw_cursor([2020, str(uuid4())]),
+    _raw_cursor(['yesterday', str(uuid4())]),
+    _raw_cursor(['2020-01-01T00:00:00', 'not-a-uuid']),
+    _raw_cursor({'created_at': '2020-01-01T00:00:00', 'id': str(uuid4())}),
+])
+def test_malformed_cursors_are_rejected_with_422(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor)
+
+    assert error.value.status_code == 422
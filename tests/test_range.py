@@ -0,0 +1,26 @@
+import pytest
+
+from miniTicktok_api.responses import parse_range
+
+
+@pytest.mark.parametrize('range_header, expected', [
+    (None, None),
+    ('', None),
+    ('bytes=0-99', (0, 99)),
+    ('bytes=100-', (100, 999)),
+    ('bytes=900-5000', (900, 999)),
+    ('bytes=-100', (900, 999)),
+    ('bytes=-5000', (0, 999)),
+    (' bytes=10-19 ', (10, 19)),
+    ('bytes=-', None),
+    ('bytes=0-9,20-29', None),
+    ('items=0-9', None),
+])
+def test_parse_range(range_header, expected):
+    assert parse_range(range_header, 1000) == expected
+
+
+@pytest.mark.parametrize('range_header', ['bytes=1000-', 'bytes=1000-1099', 'bytes=20-10', 'bytes=-0'])
+def test_unsatisfiable_ranges_raise(range_header):
+    with pytest.raises(ValueError):
+        parse_range(range_header, 1000)
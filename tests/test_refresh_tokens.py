@@ -0,0 +1,53 @@
+import pytest
+from fastapi import HTTPException
+
+from miniTicktok_api.auth import generate_access_token
+from miniTicktok_api.models.users import User
+from miniTicktok_api.routes.auth import _refresh_token
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_refresh_rotates_the_refresh_token(database):
+    user = User(username='someone')
+    access_token = await generate_access_token(user)
+
+    rotated = await _refresh_token(access_token.refresh_token)
+
+    assert rotated.refresh_token != access_token.refresh_token
+    assert (await _refresh_token(rotated.refresh_token)).refresh_token != rotated.refresh_token
+
+
+async def test_reused_refresh_token_invalidates_its_family(database):
+    access_token = await generate_access_token(User(username='someone'))
+    rotated = await _refresh_token(access_token.refresh_token)
+
+    with pytest.raises(HTTPException) as error:
+        await _refresh_token(access_token.refresh_token)
+
+    assert error.value.status_code == 401
+
+    # Whoever holds the current token of the family is locked out too, it may be the one who stole it.
+    with pytest.raises(HTTPException) as error:
+        await _refresh_token(rotated.refresh_token)
+
+    assert error.value.status_code == 401
+
+
+async def test_refresh_token_families_are_independent(database):
+    user = User(username='someone')
+    first, second = await generate_access_token(user), await generate_access_token(user)
+
+    await _refresh_token(first.refresh_token)
+
+    with pytest.raises(HTTPException):
+        await _refresh_token(first.refresh_token)
+
+    assert await _refresh_token(second.refresh_token)
+
+
+async def test_malformed_refresh_token_is_rejected(database):
+    with pytest.raises(HTTPException) as error:
+        await _refresh_token('not a token')
+
+    assert error.value.status_code == 401
@@ -0,0 +1,65 @@
+import pytest
+from fastapi import FastAPI, File, UploadFile
+from starlette.testclient import TestClient
+
+from miniTicktok_api.middleware.uploads import MULTIPART_OVERHEAD_BYTES, UploadSizeLimitMiddleware
+
+MAX_BYTES = 1024
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.add_middleware(UploadSizeLimitMiddleware, path='/upload', max_bytes=MAX_BYTES)
+
+    @app.post('/upload')
+    async def upload(file: UploadFile = File()):
+        return {'size': len(await file.read())}
+
+    return TestClient(app)
+
+
+def _multipart(size: int):
+    boundary = 'boundary'
+    body = (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="video.mp4"\r\n'
+        f'Content-Type: video/mp4\r\n\r\n'
+    ).encode() + b'x' * size + f'\r\n--{boundary}--\r\n'.encode()
+
+    return body, {'Content-Type': f'multipart/form-data; boundary={boundary}'}
+
+
+def test_upload_within_the_limit_passes(client):
+    body, headers = _multipart(MAX_BYTES)
+
+    response = client.post('/upload', content=body, headers=headers)
+
+    assert response.status_code == 200
+    assert response.json() == {'size': MAX_BYTES}
+
+
+def test_declared_oversized_upload_is_rejected_before_reading_it(client):
+    body, headers = _multipart(MAX_BYTES + MULTIPART_OVERHEAD_BYTES + 1)
+
+    response = client.post('/upload', content=body, headers=headers)
+
+    assert response.status_code == 413
+    assert response.json() == {'detail': f'Upload exceeds the maximum size of {MAX_BYTES} bytes.'}
+
+
+def test_oversized_upload_without_content_length_is_cut_off(client):
+    body, headers = _multipart(MAX_BYTES + MULTIPART_OVERHEAD_BYTES + 1)
+
+    def chunks():
+        for start in range(0, len(body), 4096):
+            yield body[start:start + 4096]
+
+    response = client.post('/upload', content=chunks(), headers=headers)
+
+    assert response.status_code == 413
+
+
+def test_other_routes_are_not_limited(client):
+    body, headers = _multipart(MAX_BYTES + MULTIPART_OVERHEAD_BYTES + 1)
+
+    assert client.post('/elsewhere', content=body, headers=headers).status_code == 404
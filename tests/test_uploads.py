@@ -0,0 +1,104 @@
+import hashlib
+import os
+from uuid import uuid4
+
+import pytest
+
+from miniTicktok_api import uploads
+from miniTicktok_api.external.storage import LocalStorageBackend
+from miniTicktok_api.models.videos import StoredVideo, VideoUploadJob, VideoUploadStatus
+from miniTicktok_api.services import services
+from miniTicktok_api.uploads import SpooledUpload, VideoUploadQueue
+
+pytestmark = pytest.mark.anyio
+
+CONTENT = b'not really a video'
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    backend = LocalStorageBackend(root=str(tmp_path / 'storage'), base_url='http://localhost:8000/media')
+    monkeypatch.setitem(services.instances, 'StorageBackend', backend)
+
+    return backend
+
+
+@pytest.fixture
+def upload(tmp_path):
+    path = tmp_path / 'upload.mp4'
+    path.write_bytes(CONTENT)
+
+    return SpooledUpload(path=str(path), size=len(CONTENT), sha256=hashlib.sha256(CONTENT).hexdigest())
+
+
+async def _process(database, upload: SpooledUpload) -> dict:
+    job = VideoUploadJob(user_id=uuid4())
+    await database.get_collection('video_upload_jobs').insert_one(job.dict())
+
+    await VideoUploadQueue(workers=1, max_size=1, max_attempts=1, retry_backoff=0)._process(job, upload)
+
+    return await database.get_collection('video_upload_jobs').find_one({'id': job.id})
+
+
+async def test_completed_upload_stores_the_recording(database, storage, upload):
+    job = await _process(database, upload)
+
+    assert job['status'] == VideoUploadStatus.COMPLETED
+    assert job['video_uri'] == f'http://localhost:8000/media/video-rec-{job["video_recording_id"]}.mp4'
+    assert await database.get_collection('video_recordings').count_documents({}) == 1
+    assert os.listdir(storage.root) == [f'video-rec-{job["video_recording_id"]}.mp4']
+
+
+async def test_failure_after_upload_fails_the_job_and_removes_the_file(database, storage, upload, monkeypatch):
+    async def insert_video_recording(job, stored_video):
+        raise RuntimeError('database unavailable')
+
+    monkeypatch.setattr(uploads, '_insert_video_recording', insert_video_recording)
+
+    job = await _process(database, upload)
+
+    assert job['status'] == VideoUploadStatus.FAILED
+    assert job['error'] == 'database unavailable'
+    assert job['video_uri'] is None
+    assert await database.get_collection('video_objects').count_documents({}) == 0
+    assert os.listdir(storage.root) == []
+
+
+async def test_failed_registration_removes_the_file(database, storage, upload, monkeypatch):
+    async def register_stored_video(stored_video):
+        raise RuntimeError('database unavailable')
+
+    monkeypatch.setattr(uploads, '_register_stored_video', register_stored_video)
+
+    job = await _process(database, upload)
+
+    assert job['status'] == VideoUploadStatus.FAILED
+    assert os.listdir(storage.root) == []
+
+
+async def test_failure_after_upload_keeps_a_shared_file(database, storage, upload, monkeypatch):
+    with open(os.path.join(storage.root, 'video-rec-shared.mp4'), 'wb') as shared_file:
+        shared_file.write(CONTENT)
+
+    await database.get_collection('video_objects').insert_one(StoredVideo(
+        content_sha256=upload.sha256,
+        storage_key='video-rec-shared.mp4',
+        video_uri='http://localhost:8000/media/video-rec-shared.mp4',
+        ref_count=1,
+    ).dict())
+
+    async def update_job(self, job, **changes):
+        if changes.get('status') == VideoUploadStatus.COMPLETED:
+            raise RuntimeError('database unavailable')
+
+        await original_update_job(self, job, **changes)
+
+    original_update_job = VideoUploadQueue._update_job
+    monkeypatch.setattr(VideoUploadQueue, '_update_job', update_job)
+
+    job = await _process(database, upload)
+
+    assert job['status'] == VideoUploadStatus.FAILED
+    assert await database.get_collection('video_recordings').count_documents({}) == 0
+    assert (await database.get_collection('video_objects').find_one({}))['ref_count'] == 1
+    assert os.listdir(storage.root) == ['video-rec-shared.mp4']
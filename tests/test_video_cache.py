@@ -0,0 +1,62 @@
+import os
+
+import pytest
+
+from miniTicktok_api.external.storage import LocalStorageBackend
+from miniTicktok_api.services import services
+from miniTicktok_api.video_cache import VideoDiskCache
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    backend = LocalStorageBackend(root=str(tmp_path / 'storage'), base_url='http://localhost:8000/media')
+    monkeypatch.setitem(services.instances, 'StorageBackend', backend)
+
+    for key in ('a.mp4', 'b.mp4', 'c.mp4'):
+        with open(os.path.join(backend.root, key), 'wb') as file:
+            file.write(key.encode() * 100)
+
+    return backend
+
+
+def _cached_files(directory) -> list:
+    return sorted(name for name in os.listdir(directory) if not name.startswith('.'))
+
+
+async def test_workers_sharing_the_directory_stay_under_max_bytes(tmp_path, storage):
+    directory = str(tmp_path / 'cache')
+    first, second = VideoDiskCache(directory, max_bytes=1000), VideoDiskCache(directory, max_bytes=1000)
+
+    await first.get_path('a.mp4')
+    await second.get_path('b.mp4')
+    await first.get_path('c.mp4')
+
+    assert _cached_files(directory) == ['b.mp4', 'c.mp4']
+    assert first.stats()['size_bytes'] == 1000
+
+
+async def test_hits_keep_files_from_being_evicted(tmp_path, storage):
+    directory = str(tmp_path / 'cache')
+    cache = VideoDiskCache(directory, max_bytes=1000)
+
+    await cache.get_path('a.mp4')
+    await cache.get_path('b.mp4')
+    os.utime(os.path.join(directory, 'b.mp4'), (0, 0))
+    await cache.get_path('b.mp4')
+    await cache.get_path('c.mp4')
+
+    assert _cached_files(directory) == ['b.mp4', 'c.mp4']
+    assert cache.stats()['hits'] == 1
+
+
+async def test_open_file_stays_readable_when_another_worker_evicts_it(tmp_path, storage):
+    directory = str(tmp_path / 'cache')
+    first, second = VideoDiskCache(directory, max_bytes=500), VideoDiskCache(directory, max_bytes=500)
+
+    with await first.open('a.mp4') as file:
+        await second.get_path('b.mp4')
+
+        assert _cached_files(directory) == ['b.mp4']
+        assert file.read() == b'a.mp4' * 100